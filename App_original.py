@@ -1,23 +1,158 @@
 import streamlit as st
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 import requests
 import json
 
-df = pd.read_csv('dados_discentes_comp_titulados_apenas.csv')
+import agregados
+import busca
+import compartilhado
+import dados
+import explorador
+import exportacao
+import filtros
+import graficos
+import graficos_vega
+import metricas
+import orientadores
+import secoes
+
+
+# Artefatos publicados uma vez por versão dos dados (por `python precomputar.py` ou pelo primeiro processo)
+# e lidos por cada processo; o cache é invalidado quando o conteúdo dos dados muda
+@st.cache(allow_output_mutation=True, show_spinner=False)
+def carregar_compartilhado(assinatura):
+    return compartilhado.anexar(assinatura)
+
+
+# Colunas usadas nos gráficos, sem cópia dos arquivos compartilhados
+def carregar_dados(assinatura):
+    return carregar_compartilhado(assinatura)['dados']
+
+
+# Cubos de contagem publicados junto com os dados
+def carregar_cubos(assinatura):
+    return carregar_compartilhado(assinatura)['cubos']
+
+
+# Tabelas absoluta e percentual de uma dimensão, guardadas por seleção da barra lateral
+@st.cache(allow_output_mutation=True, show_spinner=False)
+def tabela_dimensao(dimensao, regioes, graus_academicos, assinatura):
+    return agregados.tabela_dimensao(carregar_cubos(assinatura), dimensao, regioes, graus_academicos)
+
+
+# Bitmaps por valor das colunas filtráveis, publicados junto com os dados
+def carregar_indice_filtros(assinatura):
+    return carregar_compartilhado(assinatura)['indice_filtros']
+
+
+# Posições de cada universidade, com contagens e boxplots anuais, publicadas junto com os dados
+def carregar_indice_universidades(assinatura):
+    return carregar_compartilhado(assinatura)['indice_universidades']
+
+
+# Histogramas de idade e tempo de titulação por célula do cubo, mesclados a cada seleção
+def carregar_histogramas(assinatura):
+    return carregar_compartilhado(assinatura)['histogramas']
+
+
+# Lista de universidades guardada por seleção da barra lateral
+@st.cache(show_spinner=False)
+def lista_universidades(regioes, graus_academicos, assinatura):
+    return agregados.listar_universidades(carregar_cubos(assinatura), regioes, graus_academicos)
+
+
+# Quartis, bigodes e outliers por ano, guardados por seleção da barra lateral
+@st.cache(allow_output_mutation=True, show_spinner=False)
+def estatisticas_boxplot(coluna, regioes, graus_academicos, exato, assinatura):
+    if not exato:
+        # Soma os histogramas das células selecionadas, sem tocar nas linhas brutas
+        return agregados.estatisticas_histograma(carregar_histogramas(assinatura)[coluna], regioes, graus_academicos)
+
+    selecoes = {'NM_REGIAO': regioes, 'DS_GRAU_ACADEMICO_DISCENTE': graus_academicos}
+    posicoes = filtros.selecionar(carregar_indice_filtros(assinatura), selecoes)
+    return agregados.estatisticas_boxplot(carregar_dados(assinatura), posicoes, coluna)
+
+
+# Posições filtradas na ordem da coluna escolhida no explorador, guardadas por seleção;
+# só a coluna da ordenação é lida, das partições das regiões selecionadas
+@st.cache(allow_output_mutation=True, show_spinner=False)
+def posicoes_ordenadas(coluna, crescente, regioes, graus_academicos, assinatura):
+    selecoes = {'NM_REGIAO': regioes, 'DS_GRAU_ACADEMICO_DISCENTE': graus_academicos}
+    posicoes = filtros.selecionar(carregar_indice_filtros(assinatura), selecoes)
+    df_coluna = dados.carregar([coluna], regioes=regioes)
+    ordem = explorador.ordenar(df_coluna, filtros.posicoes_locais(df_coluna, posicoes), coluna, crescente)
+    return df_coluna.index.to_numpy()[ordem]
+
+
+# Página do explorador guardada por filtros, ordenação, número e colunas; com uma ordenação as linhas
+# da página costumam estar espalhadas por todos os grupos do snapshot, que não são lidos de novo a cada interação
+@st.cache(allow_output_mutation=True, show_spinner=False, max_entries=32)
+def pagina_dados_brutos(coluna, crescente, numero, tamanho_pagina, colunas, regioes, graus_academicos, assinatura):
+    if coluna == 'Ordem original':
+        selecoes = {'NM_REGIAO': regioes, 'DS_GRAU_ACADEMICO_DISCENTE': graus_academicos}
+        posicoes = filtros.selecionar(carregar_indice_filtros(assinatura), selecoes)
+    else:
+        posicoes = posicoes_ordenadas(coluna, crescente, regioes, graus_academicos, assinatura)
+    return explorador.pagina(posicoes, numero, tamanho_pagina, list(colunas))
+
+
+# Índice invertido dos títulos e orientadores, lido do disco ou construído uma única vez por versão dos dados
+@st.cache(allow_output_mutation=True, show_spinner=False)
+def carregar_indice_busca(assinatura):
+    return busca.carregar_indice(assinatura=assinatura)
+
+
+# Posições e relevâncias das linhas encontradas, guardadas por texto buscado
+@st.cache(allow_output_mutation=True, show_spinner=False)
+def resultados_busca(consulta, assinatura):
+    return busca.buscar(carregar_indice_busca(assinatura), consulta)
+
+
+# Linhas dos trabalhos encontrados, lendo só os grupos de linhas do snapshot onde eles estão
+@st.cache(allow_output_mutation=True, show_spinner=False, max_entries=32)
+def trabalhos_encontrados(posicoes, assinatura):
+    return dados.carregar_linhas(posicoes, busca.COLUNAS_RESULTADOS).reset_index(drop=True)
+
+
+# Índice de orientadores com os nomes codificados como inteiros, publicado junto com os dados
+def carregar_indice_orientadores(assinatura):
+    return carregar_compartilhado(assinatura)['indice_orientadores']
+
+
+# Orientadores em destaque, guardados por seleção da barra lateral
+@st.cache(allow_output_mutation=True, show_spinner=False)
+def destaques_orientadores(quantidade, regioes, graus_academicos, assinatura):
+    selecoes = {'NM_REGIAO': regioes, 'DS_GRAU_ACADEMICO_DISCENTE': graus_academicos}
+    linhas = filtros.linhas_selecionadas(carregar_indice_filtros(assinatura), selecoes)
+    indice = carregar_indice_orientadores(assinatura)
+    return orientadores.mais_egressos(indice, quantidade, linhas), orientadores.varias_instituicoes(indice, quantidade, linhas)
+
+
+# Cronômetro desta execução: cada metricas.secao mede o trecho até a próxima
+metricas.iniciar_execucao()
+metricas.secao('carga')
+
+assinatura = dados.assinatura_dados()
+
+# Apenas as colunas usadas nos gráficos; a tabela completa é lida sob demanda
+df = carregar_dados(assinatura)
+indice_filtros = carregar_indice_filtros(assinatura)
+indice_universidades = carregar_indice_universidades(assinatura)
 
 st.markdown('#### Explorando egressos de pós graduação da área de computação :nerd_face:')
 st.markdown(""":mortar_board: Este projeto explora dados de egressos de pós-graduação da CAPES utilizando o Streamlit.""")
 st.markdown(":open_book: O objetivo é demonstrar a funcionalidade do Streamlit com dados reais na disciplina de Estágio à Docência do mestrado da UNIRIO.")
 st.markdown('---')
 
+metricas.secao('filtros')
 grau_academico = df['DS_GRAU_ACADEMICO_DISCENTE'].unique().tolist()
 regiao = df['NM_REGIAO'].unique().tolist()
 
 st.sidebar.markdown("### Filtre os egressos da pós de computação")
 selecao_grau_academico = st.sidebar.multiselect('Filtre pelo grau acadêmico:', grau_academico, default=grau_academico)
 selecao_regiao = st.sidebar.multiselect('Filtre pela região:', regiao, default=regiao)
+distribuicoes_exatas = st.sidebar.checkbox('Calcular distribuições exatas (mais lento)')
+graficos_interativos = st.sidebar.checkbox('Gráficos interativos, desenhados no navegador', value=True)
+navegacao = st.sidebar.empty()
 
 st.sidebar.markdown("""
     <p style='font-size: 10px;'>
@@ -28,366 +163,396 @@ st.sidebar.markdown("""
     </p>
     """, unsafe_allow_html=True)
 
-filtered_df = df[(df['NM_REGIAO'].isin(selecao_regiao) & (df['DS_GRAU_ACADEMICO_DISCENTE'].isin(selecao_grau_academico)))]
+# Posições das linhas selecionadas, combinando os bitmaps em vez de copiar o DataFrame
+selecoes = {'NM_REGIAO': selecao_regiao, 'DS_GRAU_ACADEMICO_DISCENTE': selecao_grau_academico}
+linhas_filtradas = filtros.linhas_selecionadas(indice_filtros, selecoes)
+posicoes_filtradas = linhas_filtradas.nonzero()[0]
 
+# Tudo que identifica a seleção atual, usado nas chaves do cache de gráficos
+estado_filtros = (assinatura, tuple(selecao_regiao), tuple(selecao_grau_academico))
 
-st.markdown('##### Quantos egressos da computação estamos tendo? :student:')
 
+def exibir_grafico(chave, desenhar, destino=st):
+    """Exibe o gráfico com o backend escolhido na barra lateral.
 
-# Pré-processamento dos dados
-grouped_df = filtered_df.groupby(['AN_BASE', 'NM_REGIAO']).size().reset_index(name='counts')
+    desenhar(backend) recebe graficos_vega, cuja especificação é desenhada no navegador, ou graficos,
+    cuja figura vira um PNG reaproveitado do cache de imagens quando nada mudou.
+    """
+    if graficos_interativos:
+        destino.vega_lite_chart(spec=desenhar(graficos_vega), use_container_width=True)
+    else:
+        destino.image(graficos.renderizar(chave, lambda: graficos.figura_para_png(desenhar(graficos))), use_column_width=True)
 
-# Criando uma tabela dinâmica para o gráfico de barras empilhado
-pivot_df = grouped_df.pivot(index='AN_BASE', columns='NM_REGIAO', values='counts').fillna(0)
 
-# Normalizando as contagens para obter porcentagens
-pivot_df_percentage = pivot_df.divide(pivot_df.sum(axis=1), axis=0) * 100
+def escolha_no_servidor(rotulo, opcoes):
+    """Botão de rádio só para as imagens; nos gráficos interativos a escolha é feita dentro do próprio gráfico."""
+    return opcoes[0] if graficos_interativos else st.radio(rotulo, opcoes)
 
-# Definindo um tema e inicializando uma figura
-sns.set_theme(style="whitegrid")
 
-# Botão de rádio para alternar entre os gráficos
-tipo_grafico = st.radio('Escolha o tipo de gráfico:', ('Valores absolutos', 'Porcentagem'))
+def grafico_barras_empilhadas(dimensao, modo):
+    """Exibe o gráfico de barras empilhadas de uma dimensão; a tabela só é consultada quando o gráfico precisa ser desenhado."""
+    def desenhar(backend):
+        tabelas = tabela_dimensao(dimensao, selecao_regiao, selecao_grau_academico, assinatura)
+        return backend.barras_empilhadas(tabelas, dimensao, modo)
 
-if tipo_grafico == 'Porcentagem':
-    # Gráfico de barras empilhadas com porcentagens
-    pivot_df_percentage.plot(kind='bar', stacked=True, figsize=(15, 8), edgecolor="0.2")
-    plt.xlabel('Ano')
-    plt.ylabel('Porcentagem')
-    plt.title('Gráfico de barras empilhadas de contagem de egressos por ano e região', fontsize=14)
-    plt.legend(loc='lower right', prop={'size': 10})
-else:
-    # Gráfico de barras empilhadas com valores absolutos
-    pivot_df.plot(kind='bar', stacked=True, figsize=(15, 8), edgecolor="0.2")
-    plt.xlabel('Ano')
-    plt.ylabel('Contagem')
-    plt.title('Gráfico de barras empilhadas de contagem de egressos por ano e região', fontsize=14)
-    plt.legend(loc='lower right', prop={'size': 10})
+    exibir_grafico(('barras_empilhadas', dimensao, modo, estado_filtros), desenhar)
 
-# Para exibir o gráfico no Streamlit
-st.pyplot(plt.gcf())
 
-# E explorando universidades?
+def estatisticas_universidade(coluna, universidade):
+    """Boxplots por ano de uma universidade: pelas linhas dela no modo exato ou mesclando os histogramas das suas células."""
+    if distribuicoes_exatas:
+        return agregados.boxplot_universidade(indice_universidades, universidade, df, linhas_filtradas, coluna)
+    return agregados.estatisticas_histograma(carregar_histogramas(assinatura)[coluna], selecao_regiao, selecao_grau_academico, universidade)
 
-# Botão de expansão para a seleção de universidade
-expander = st.expander("Deseja investigar alguma universidade em específico?")
 
-# Lista de universidades
-universidades = filtered_df['NM_ENTIDADE_ENSINO'].unique().tolist()
+# Seções do painel, registradas na ordem em que aparecem e agrupadas em páginas
+SECOES = {}
 
-# Caixa de seleção para escolher uma universidade
-universidade_selecionada = expander.selectbox('Selecione uma universidade:', universidades)
 
-# Filtrando o dataframe para a universidade selecionada
-df_universidade = filtered_df[filtered_df['NM_ENTIDADE_ENSINO'] == universidade_selecionada]
+@secoes.secao(SECOES, 'Visão geral')
+def secao_barras_regiao():
+    """Quantos egressos da computação estamos tendo?"""
+    st.markdown('##### Quantos egressos da computação estamos tendo? :student:')
 
-# Agrupando os dados por ano
-grouped_df = df_universidade.groupby('AN_BASE').size().reset_index(name='counts')
 
-# Definindo um tema e inicializando uma figura
-sns.set_theme(style="whitegrid")
+    # Botão de rádio para alternar entre os gráficos
+    tipo_grafico = escolha_no_servidor('Escolha o tipo de gráfico:', ('Valores absolutos', 'Porcentagem'))
 
-with expander:
-    # Gráfico de linhas para a universidade selecionada
-    plt.figure(figsize=(15, 8))
-    line_plot = sns.lineplot(x='AN_BASE', y='counts', data=grouped_df, linewidth=2.5)
-    line_plot.set(xlabel='Ano', ylabel='Contagem')
-    line_plot.set_ylim(bottom=0)  # Define o limite inferior do eixo y como 0
-    plt.title('Gráfico de linha de contagem de egressos por ano para ' + universidade_selecionada, fontsize=14)
+    # Gráfico de barras empilhadas a partir do cubo de contagens, reaproveitando a imagem quando nada mudou
+    grafico_barras_empilhadas('NM_REGIAO', tipo_grafico)
 
-    # Para exibir o gráfico no Streamlit
-    st.pyplot(plt.gcf())
-st.markdown('---')
-st.markdown('##### Qual dependência administrativa dos egressos? :bar_chart:')
+    # E explorando universidades?
 
-# Pré-processamento dos dados
-grouped_df_dep = filtered_df.groupby(['AN_BASE', 'DS_DEPENDENCIA_ADMINISTRATIVA']).size().reset_index(name='counts')
+    # Botão de expansão para a seleção de universidade
+    expander = st.expander("Deseja investigar alguma universidade em específico?")
 
-# Criando uma tabela dinâmica para o gráfico de barras empilhado
-pivot_df_dep = grouped_df_dep.pivot(index='AN_BASE', columns='DS_DEPENDENCIA_ADMINISTRATIVA', values='counts').fillna(0)
+    # Lista de universidades
+    universidades = lista_universidades(selecao_regiao, selecao_grau_academico, assinatura)
 
-# Normalizando as contagens para obter porcentagens
-pivot_df_percentage_dep = pivot_df_dep.divide(pivot_df_dep.sum(axis=1), axis=0) * 100
+    # Caixa de seleção para escolher uma universidade
+    universidade_selecionada = secoes.escolha_sob_demanda(expander, 'Selecione uma universidade:', universidades)
 
-# Definindo um tema e inicializando uma figura
-sns.set_theme(style="whitegrid")
+    # O detalhe só é calculado depois que uma universidade é escolhida
+    if universidade_selecionada:
+        # Contagem anual da universidade, consultando apenas as linhas dela no índice pré-agrupado
+        grouped_df = agregados.contagens_ano_universidade(indice_universidades, universidade_selecionada, df, linhas_filtradas).reset_index(name='counts')
 
-# Botão de rádio para alternar entre os gráficos
-tipo_grafico_selecionado_dep = st.radio('Escolha o tipo de gráfico a ser exibido:  ', ('Valores absolutos', 'Porcentagem'))
 
-if tipo_grafico_selecionado_dep == 'Porcentagem':
-    # Gráfico de barras empilhadas com porcentagens
-    pivot_df_percentage_dep.plot(kind='bar', stacked=True, figsize=(15, 8), edgecolor="0.2")
-    plt.xlabel('Ano')
-    plt.ylabel('Porcentagem')
-    plt.title('Gráfico de barras empilhadas de contagem de egressos por ano e região', fontsize=14)
-    plt.legend(loc='lower right', prop={'size': 10})
-else:
-    # Gráfico de barras empilhadas com valores absolutos
-    pivot_df_dep.plot(kind='bar', stacked=True, figsize=(15, 8), edgecolor="0.2")
-    plt.xlabel('Ano')
-    plt.ylabel('Contagem')
-    plt.title('Gráfico de barras empilhadas de contagem de egressos por ano e região', fontsize=14)
-    plt.legend(loc='lower right', prop={'size': 10})
+        def desenhar_grafico_universidade(backend):
+            # Gráfico de linhas para a universidade selecionada
+            return backend.linhas(grouped_df, 'Gráfico de linha de contagem de egressos por ano para ' + universidade_selecionada)
 
-# Para exibir o gráfico no Streamlit
-st.pyplot(plt.gcf())
 
+        with expander:
+            # Para exibir o gráfico no Streamlit, reaproveitando a imagem quando nada mudou
+            exibir_grafico(('linha_universidade', estado_filtros, universidade_selecionada), desenhar_grafico_universidade)
 
-st.markdown('---')
-st.markdown('##### Qual a distribuição dos egressos de acordo com o status jurídico de suas instituições? :bar_chart:')
 
-# Pré-processamento dos dados
-grouped_df_jur = filtered_df.groupby(['AN_BASE', 'CS_STATUS_JURIDICO']).size().reset_index(name='counts')
+@secoes.secao(SECOES, 'Instituições e programas')
+def secao_dependencia_administrativa():
+    """Qual dependência administrativa dos egressos?"""
+    st.markdown('##### Qual dependência administrativa dos egressos? :bar_chart:')
 
-# Criando uma tabela dinâmica para o gráfico de barras empilhado
-pivot_df_jur = grouped_df_jur.pivot(index='AN_BASE', columns='CS_STATUS_JURIDICO', values='counts').fillna(0)
+    # Botão de rádio para alternar entre os gráficos
+    tipo_grafico_selecionado_dep = escolha_no_servidor('Escolha o tipo de gráfico a ser exibido:  ', ('Valores absolutos', 'Porcentagem'))
 
-# Normalizando as contagens para obter porcentagens
-pivot_df_percentage_jur = pivot_df_jur.divide(pivot_df_jur.sum(axis=1), axis=0) * 100
+    # Gráfico de barras empilhadas a partir do cubo de contagens, reaproveitando a imagem quando nada mudou
+    grafico_barras_empilhadas('DS_DEPENDENCIA_ADMINISTRATIVA', tipo_grafico_selecionado_dep)
 
-# Definindo um tema e inicializando uma figura
-sns.set_theme(style="whitegrid")
 
-# Botão de rádio para alternar entre os gráficos
-tipo_grafico_selecionado_jur = st.radio('Escolha o tipo de gráfico a ser exibido:   ', ('Valores absolutos', 'Porcentagem'))
+@secoes.secao(SECOES, 'Instituições e programas')
+def secao_status_juridico():
+    """Qual a distribuição dos egressos de acordo com o status jurídico de suas instituições?"""
+    st.markdown('##### Qual a distribuição dos egressos de acordo com o status jurídico de suas instituições? :bar_chart:')
 
-if tipo_grafico_selecionado_jur == 'Porcentagem':
-    # Gráfico de barras empilhadas com porcentagens
-    pivot_df_percentage_jur.plot(kind='bar', stacked=True, figsize=(15, 8), edgecolor="0.2")
-    plt.xlabel('Ano')
-    plt.ylabel('Porcentagem')
-    plt.title('Gráfico de barras empilhadas de contagem de egressos por ano e região', fontsize=14)
-    plt.legend(loc='lower right', prop={'size': 10})
-else:
-    # Gráfico de barras empilhadas com valores absolutos
-    pivot_df_jur.plot(kind='bar', stacked=True, figsize=(15, 8), edgecolor="0.2")
-    plt.xlabel('Ano')
-    plt.ylabel('Contagem')
-    plt.title('Gráfico de barras empilhadas de contagem de egressos por ano e região', fontsize=14)
-    plt.legend(loc='lower right', prop={'size': 10})
+    # Botão de rádio para alternar entre os gráficos
+    tipo_grafico_selecionado_jur = escolha_no_servidor('Escolha o tipo de gráfico a ser exibido:   ', ('Valores absolutos', 'Porcentagem'))
 
-# Para exibir o gráfico no Streamlit
-st.pyplot(plt.gcf())
+    # Gráfico de barras empilhadas a partir do cubo de contagens, reaproveitando a imagem quando nada mudou
+    grafico_barras_empilhadas('CS_STATUS_JURIDICO', tipo_grafico_selecionado_jur)
 
-st.markdown('---')
-st.markdown('##### Qual a idade dos nossos egressos de computação? :runner:')
 
-# Definindo um tema e inicializando uma figura
-sns.set_theme(style="whitegrid")
+@secoes.secao(SECOES, 'Idade e titulação')
+def secao_idade():
+    """Qual a idade dos nossos egressos de computação?"""
+    st.markdown('##### Qual a idade dos nossos egressos de computação? :runner:')
 
-# Configurando tamanho da figura
-plt.figure(figsize=(15, 8))
+    # Lista de universidades, guardada por seleção da barra lateral
+    universidades = lista_universidades(selecao_regiao, selecao_grau_academico, assinatura)
 
-# Botão de rádio para escolher se deseja visualizar outliers
-show_outliers = st.radio('Deseja visualizar outliers?', ('Sim', 'Não'))
+    # Botão de rádio para escolher se deseja visualizar outliers
+    show_outliers = escolha_no_servidor('Deseja visualizar outliers?', ('Sim', 'Não'))
 
-# Criando o boxplot
-box_plot = sns.boxplot(x='AN_BASE', y='IDADE_APROX_DISCENTE', data=filtered_df, showfliers = (show_outliers == 'Sim'), color="#2a9d8f")
-box_plot.set(xlabel='Ano', ylabel='Idade Aproximada')
-plt.title('Distribuição das idades aproximadas dos egressos de computação por ano', fontsize=14)
 
-# Para exibir o gráfico no Streamlit
-st.pyplot(plt.gcf())
+    def desenhar_boxplot_idade(backend):
+        # Estatísticas guardadas por seleção; o botão de outliers só muda o desenho
+        estatisticas = estatisticas_boxplot('IDADE_APROX_DISCENTE', selecao_regiao, selecao_grau_academico, distribuicoes_exatas, assinatura)
 
-# Criando um painel expansível
-expander_idade = st.expander("Deseja investigar a idade dos egressos de uma universidade específica?")
+        # Criando o boxplot a partir das estatísticas, sem repassar as linhas brutas
+        return backend.boxplot(estatisticas, show_outliers == 'Sim', 'Distribuição das idades aproximadas dos egressos de computação por ano', 'Idade Aproximada')
 
-# Caixa de seleção para escolher uma universidade
-universidade_selecionada_idade = expander_idade.selectbox('Selecione uma universidade abaixo:', universidades)
 
-# Filtrando o dataframe para a universidade selecionada
-df_universidade_idade = filtered_df[filtered_df['NM_ENTIDADE_ENSINO'] == universidade_selecionada_idade]
+    # Para exibir o gráfico no Streamlit, reaproveitando a imagem quando nada mudou
+    exibir_grafico(('boxplot_idade', estado_filtros, distribuicoes_exatas, show_outliers), desenhar_boxplot_idade)
 
-# Configurando tamanho da figura
-plt.figure(figsize=(15, 8))
+    # Criando um painel expansível
+    expander_idade = st.expander("Deseja investigar a idade dos egressos de uma universidade específica?")
 
-# Criando o boxplot para a universidade selecionada
-box_plot = sns.boxplot(x='AN_BASE', y='IDADE_APROX_DISCENTE', data=df_universidade_idade, showfliers = (show_outliers == 'Sim'), color="#2a9d8f")
-box_plot.set(xlabel='Ano', ylabel='Idade Aproximada')
-plt.title('Distribuição das idades aproximadas dos egressos de computação por ano para ' + universidade_selecionada_idade, fontsize=14)
+    # Caixa de seleção para escolher uma universidade
+    universidade_selecionada_idade = secoes.escolha_sob_demanda(expander_idade, 'Selecione uma universidade abaixo:', universidades)
 
-# Para exibir o gráfico no Streamlit
-expander_idade.pyplot(plt.gcf())
+    # O detalhe só é calculado depois que uma universidade é escolhida
+    if universidade_selecionada_idade:
+        def desenhar_boxplot_universidade_idade(backend):
+            # Estatísticas da universidade, exatas ou mescladas dos histogramas conforme a barra lateral
+            estatisticas = estatisticas_universidade('IDADE_APROX_DISCENTE', universidade_selecionada_idade)
 
-st.markdown('---')
-st.markdown('##### Quantos meses demora até a titulação dos egressos de computação? :alarm_clock:')
+            # Criando o boxplot a partir das estatísticas, sem repassar as linhas brutas
+            return backend.boxplot(estatisticas, show_outliers == 'Sim', 'Distribuição das idades aproximadas dos egressos de computação por ano para ' + universidade_selecionada_idade, 'Idade Aproximada')
 
-# Definindo um tema e inicializando uma figura
-sns.set_theme(style="whitegrid")
 
-# Configurando tamanho da figura
-plt.figure(figsize=(15, 8))
+        # Para exibir o gráfico no Streamlit, reaproveitando a imagem quando nada mudou
+        exibir_grafico(('boxplot_universidade_idade', estado_filtros, distribuicoes_exatas, show_outliers, universidade_selecionada_idade), desenhar_boxplot_universidade_idade, expander_idade)
 
-# Botão de rádio para escolher se deseja visualizar outliers
-show_outliers_tempo = st.radio('Deseja visualizar os outliers?', ('Sim', 'Não'))
 
-# Criando o boxplot
-box_plot = sns.boxplot(x='AN_BASE', y='QT_MES_TITULACAO', data=filtered_df, showfliers = (show_outliers_tempo == 'Sim'), color="#2a9d8f")
-box_plot.set(xlabel='Ano', ylabel='Meses até titulação')
-box_plot.set_ylim(bottom=0)
-plt.title('Distribuição do tempo dos egressos de computação por ano até a titulação', fontsize=14)
+@secoes.secao(SECOES, 'Idade e titulação')
+def secao_tempo_titulacao():
+    """Quantos meses demora até a titulação dos egressos de computação?"""
+    st.markdown('##### Quantos meses demora até a titulação dos egressos de computação? :alarm_clock:')
 
-# Para exibir o gráfico no Streamlit
-st.pyplot(plt.gcf())
+    # Lista de universidades, guardada por seleção da barra lateral
+    universidades = lista_universidades(selecao_regiao, selecao_grau_academico, assinatura)
 
-# Criando um painel expansível
-expander_tempo = st.expander("Deseja investigar o tempo até a titulação egressos de uma universidade específica?")
+    # Botão de rádio para escolher se deseja visualizar outliers
+    show_outliers_tempo = escolha_no_servidor('Deseja visualizar os outliers?', ('Sim', 'Não'))
 
-# Caixa de seleção para escolher uma universidade
-universidade_selecionada_tempo = expander_tempo.selectbox('Selecione uma universidade da lista:', universidades)
 
-# Filtrando o dataframe para a universidade selecionada
-df_universidade_tempo = filtered_df[filtered_df['NM_ENTIDADE_ENSINO'] == universidade_selecionada_tempo]
+    def desenhar_boxplot_tempo(backend):
+        # Estatísticas guardadas por seleção; o botão de outliers só muda o desenho
+        estatisticas = estatisticas_boxplot('QT_MES_TITULACAO', selecao_regiao, selecao_grau_academico, distribuicoes_exatas, assinatura)
 
-# Configurando tamanho da figura
-plt.figure(figsize=(15, 8))
+        # Criando o boxplot a partir das estatísticas, sem repassar as linhas brutas
+        return backend.boxplot(estatisticas, show_outliers_tempo == 'Sim', 'Distribuição do tempo dos egressos de computação por ano até a titulação', 'Meses até titulação', limite_inferior=0)
 
-# Criando o boxplot para a universidade selecionada
-box_plot_uni = sns.boxplot(x='AN_BASE', y='QT_MES_TITULACAO', data=df_universidade_tempo, showfliers = (show_outliers_tempo == 'Sim'), color="#2a9d8f")
-box_plot_uni.set(xlabel='Ano', ylabel='Meses até titulação')
-box_plot_uni.set_ylim(bottom=0)
-plt.title('Distribuição do tempo até a titulação dos egressos de computação por ano para ' + universidade_selecionada_tempo, fontsize=14)
 
-# Para exibir o gráfico no Streamlit
-expander_tempo.pyplot(plt.gcf())
+    # Para exibir o gráfico no Streamlit, reaproveitando a imagem quando nada mudou
+    exibir_grafico(('boxplot_tempo', estado_filtros, distribuicoes_exatas, show_outliers_tempo), desenhar_boxplot_tempo)
 
-st.markdown('---')
-st.markdown('##### Quantos egressos existem de acordo com a nota CAPES do programa? :bar_chart:')
+    # Criando um painel expansível
+    expander_tempo = st.expander("Deseja investigar o tempo até a titulação egressos de uma universidade específica?")
 
-# Pré-processamento dos dados
-grouped_df_programa = filtered_df.groupby(['AN_BASE', 'CD_CONCEITO_PROGRAMA']).size().reset_index(name='counts')
+    # Caixa de seleção para escolher uma universidade
+    universidade_selecionada_tempo = secoes.escolha_sob_demanda(expander_tempo, 'Selecione uma universidade da lista:', universidades)
 
-# Criando uma tabela dinâmica para o gráfico de barras empilhado
-pivot_df_programa = grouped_df_programa.pivot(index='AN_BASE', columns='CD_CONCEITO_PROGRAMA', values='counts').fillna(0)
+    # O detalhe só é calculado depois que uma universidade é escolhida
+    if universidade_selecionada_tempo:
+        def desenhar_boxplot_universidade_tempo(backend):
+            # Estatísticas da universidade, exatas ou mescladas dos histogramas conforme a barra lateral
+            estatisticas = estatisticas_universidade('QT_MES_TITULACAO', universidade_selecionada_tempo)
 
-# Normalizando as contagens para obter porcentagens
-pivot_df_percentage_programa = pivot_df_programa.divide(pivot_df_programa.sum(axis=1), axis=0) * 100
+            # Criando o boxplot a partir das estatísticas, sem repassar as linhas brutas
+            return backend.boxplot(estatisticas, show_outliers_tempo == 'Sim', 'Distribuição do tempo até a titulação dos egressos de computação por ano para ' + universidade_selecionada_tempo, 'Meses até titulação', limite_inferior=0)
 
-# Definindo um tema e inicializando uma figura
-sns.set_theme(style="whitegrid")
 
-# Botão de rádio para alternar entre os gráficos
-tipo_grafico_selecionado_programa = st.radio('Escolha o tipo de gráfico a ser exibido:', ('Valores absolutos', 'Porcentagem'))
+        # Para exibir o gráfico no Streamlit, reaproveitando a imagem quando nada mudou
+        exibir_grafico(('boxplot_universidade_tempo', estado_filtros, distribuicoes_exatas, show_outliers_tempo, universidade_selecionada_tempo), desenhar_boxplot_universidade_tempo, expander_tempo)
 
-if tipo_grafico_selecionado_programa == 'Porcentagem':
-    # Gráfico de barras empilhadas com porcentagens
-    pivot_df_percentage_programa.plot(kind='bar', stacked=True, figsize=(15, 8), edgecolor="0.2")
-    plt.xlabel('Ano')
-    plt.ylabel('Porcentagem')
-    plt.title('Gráfico de barras empilhadas de contagem de egressos por ano e região', fontsize=14)
-    plt.legend(loc='lower right', prop={'size': 10})
-else:
-    # Gráfico de barras empilhadas com valores absolutos
-    pivot_df_programa.plot(kind='bar', stacked=True, figsize=(15, 8), edgecolor="0.2")
-    plt.xlabel('Ano')
-    plt.ylabel('Contagem')
-    plt.title('Gráfico de barras empilhadas de contagem de egressos por ano e região', fontsize=14)
-    plt.legend(loc='lower right', prop={'size': 10})
 
-# Para exibir o gráfico no Streamlit
-st.pyplot(plt.gcf())
+@secoes.secao(SECOES, 'Instituições e programas')
+def secao_nota_capes():
+    """Quantos egressos existem de acordo com a nota CAPES do programa?"""
+    st.markdown('##### Quantos egressos existem de acordo com a nota CAPES do programa? :bar_chart:')
 
+    # Botão de rádio para alternar entre os gráficos
+    tipo_grafico_selecionado_programa = escolha_no_servidor('Escolha o tipo de gráfico a ser exibido:', ('Valores absolutos', 'Porcentagem'))
 
-st.markdown('---')
-st.markdown('##### Qual a participação de estrangeiros nos egressos? :airplane:')
+    # Gráfico de barras empilhadas a partir do cubo de contagens, reaproveitando a imagem quando nada mudou
+    grafico_barras_empilhadas('CD_CONCEITO_PROGRAMA', tipo_grafico_selecionado_programa)
 
 
-# Pré-processamento dos dados
-grouped_df_nacionalidade = filtered_df.groupby(['AN_BASE', 'DS_TIPO_NACIONALIDADE_DISCENTE']).size().reset_index(name='counts')
+@secoes.secao(SECOES, 'Instituições e programas')
+def secao_nacionalidade():
+    """Qual a participação de estrangeiros nos egressos?"""
+    st.markdown('##### Qual a participação de estrangeiros nos egressos? :airplane:')
 
-# Criando uma tabela dinâmica para o gráfico de barras empilhado
-pivot_df_nacionalidade = grouped_df_nacionalidade.pivot(index='AN_BASE', columns='DS_TIPO_NACIONALIDADE_DISCENTE', values='counts').fillna(0)
+    # Lista de universidades, guardada por seleção da barra lateral
+    universidades = lista_universidades(selecao_regiao, selecao_grau_academico, assinatura)
 
-# Normalizando as contagens para obter porcentagens
-pivot_df_percentage_nacionalidade = pivot_df_nacionalidade.divide(pivot_df_nacionalidade.sum(axis=1), axis=0) * 100
 
-# Definindo um tema e inicializando uma figura
-sns.set_theme(style="whitegrid")
+    # Botão de rádio para alternar entre os gráficos
+    tipo_grafico_nacionalidade = escolha_no_servidor('Escolha o tipo de gráfico :', ('Valores absolutos', 'Porcentagem'))
 
-# Botão de rádio para alternar entre os gráficos
-tipo_grafico_nacionalidade = st.radio('Escolha o tipo de gráfico :', ('Valores absolutos', 'Porcentagem'))
+    # Gráfico de barras empilhadas a partir do cubo de contagens, reaproveitando a imagem quando nada mudou
+    grafico_barras_empilhadas('DS_TIPO_NACIONALIDADE_DISCENTE', tipo_grafico_nacionalidade)
 
-if tipo_grafico_nacionalidade == 'Porcentagem':
-    # Gráfico de barras empilhadas com porcentagens
-    pivot_df_percentage_nacionalidade.plot(kind='bar', stacked=True, figsize=(15, 8), edgecolor="0.2")
-    plt.xlabel('Ano')
-    plt.ylabel('Porcentagem')
-    plt.title('Gráfico de barras empilhadas de contagem de egressos por ano e região', fontsize=14)
-    plt.legend(loc='lower right', prop={'size': 10})
-else:
-    # Gráfico de barras empilhadas com valores absolutos
-    pivot_df_nacionalidade.plot(kind='bar', stacked=True, figsize=(15, 8), edgecolor="0.2")
-    plt.xlabel('Ano')
-    plt.ylabel('Contagem')
-    plt.title('Gráfico de barras empilhadas de contagem de egressos por ano e região', fontsize=14)
-    plt.legend(loc='lower right', prop={'size': 10})
+    # E explorando universidades?
 
-# Para exibir o gráfico no Streamlit
-st.pyplot(plt.gcf())
+    # Botão de expansão para a seleção de universidade
+    expander_nacionalidade = st.expander("Deseja investigar alguma universidade em específico?")
 
-# E explorando universidades?
+    # Caixa de seleção para escolher uma universidade
+    universidade_selecionada_nacionalidade = secoes.escolha_sob_demanda(expander_nacionalidade, 'Selecione uma universidade :', universidades)
 
-# Botão de expansão para a seleção de universidade
-expander_nacionalidade = st.expander("Deseja investigar alguma universidade em específico?")
+    # O detalhe só é calculado depois que uma universidade é escolhida
+    if universidade_selecionada_nacionalidade:
+        # Estrangeiros da universidade selecionada, consultando apenas as linhas dela
+        linhas_estrangeiros = filtros.linhas_selecionadas(indice_filtros, dict(selecoes, DS_TIPO_NACIONALIDADE_DISCENTE=['ESTRANGEIRO']))
+        posicoes_universidade_nacionalidade = agregados.posicoes_universidade(indice_universidades, universidade_selecionada_nacionalidade, linhas_estrangeiros)
 
-# Lista de universidades
-universidades = filtered_df['NM_ENTIDADE_ENSINO'].unique().tolist()
+        # Agrupando os dados por ano
+        grouped_df_nacionalidade = agregados.contagens_ano(df, posicoes_universidade_nacionalidade).reset_index(name='counts')
 
-# Caixa de seleção para escolher uma universidade
-universidade_selecionada_nacionalidade = expander_nacionalidade.selectbox('Selecione uma universidade :', universidades)
 
-# Filtrando o dataframe para a universidade selecionada
-df_universidade_nacionalidade = filtered_df[(filtered_df['NM_ENTIDADE_ENSINO'] == universidade_selecionada_nacionalidade) & (filtered_df['DS_TIPO_NACIONALIDADE_DISCENTE'] == 'ESTRANGEIRO')]
+        def desenhar_grafico_universidade_nacionalidade(backend):
+            # Gráfico de linhas para a universidade selecionada
+            return backend.linhas(grouped_df_nacionalidade, 'Gráfico de linha de contagem de egressos por ano para ' + universidade_selecionada_nacionalidade)
 
 
+        with expander_nacionalidade:
+            # Para exibir o gráfico no Streamlit, reaproveitando a imagem quando nada mudou
+            exibir_grafico(('linha_universidade_nacionalidade', estado_filtros, universidade_selecionada_nacionalidade), desenhar_grafico_universidade_nacionalidade)
 
-# Agrupando os dados por ano
-grouped_df_nacionalidade = df_universidade_nacionalidade.groupby('AN_BASE').size().reset_index(name='counts')
 
-# Definindo um tema e inicializando uma figura
-sns.set_theme(style="whitegrid")
+@secoes.secao(SECOES, 'Pesquisas e orientadores')
+def secao_busca():
+    """Sobre o que pesquisam nossos egressos?"""
+    st.markdown('##### Sobre o que pesquisam nossos egressos? :mag:')
 
-with expander_nacionalidade:
-    # Gráfico de linhas para a universidade selecionada
-    plt.figure(figsize=(15, 8))
-    line_plot_nacionalidade = sns.lineplot(x='AN_BASE', y='counts', data=grouped_df_nacionalidade, linewidth=2.5)
-    line_plot.set(xlabel='Ano', ylabel='Contagem')
-    line_plot.set_ylim(bottom=0)  # Define o limite inferior do eixo y como 0
-    plt.title('Gráfico de linha de contagem de egressos por ano para ' + universidade_selecionada_nacionalidade, fontsize=14)
+    # Busca por palavras, combinada com os filtros da barra lateral
+    consulta = st.text_input('Busque palavras do título da tese ou dissertação ou o nome do orientador:')
 
-    # Para exibir o gráfico no Streamlit
-    st.pyplot(plt.gcf())
+    if consulta:
+        posicoes_busca, _ = resultados_busca(consulta, assinatura)
+        posicoes_busca = posicoes_busca[linhas_filtradas[posicoes_busca]]
+        st.markdown(f'{len(posicoes_busca)} trabalhos encontrados para "{consulta}".')
 
-st.markdown('---')
-st.markdown('##### Que tal explorar um pouco mais os dados brutos? :airplane:')
-
-filtered_df[['AN_BASE', 'NM_GRANDE_AREA_CONHECIMENTO',
-       'CD_AREA_AVALIACAO', 'NM_AREA_AVALIACAO', 'CD_ENTIDADE_CAPES',
-       'CD_ENTIDADE_EMEC', 'SG_ENTIDADE_ENSINO', 'NM_ENTIDADE_ENSINO',
-       'CS_STATUS_JURIDICO', 'DS_DEPENDENCIA_ADMINISTRATIVA',
-       'NM_MODALIDADE_PROGRAMA', 'NM_GRAU_PROGRAMA', 'CD_PROGRAMA_IES',
-       'NM_PROGRAMA_IES', 'NM_REGIAO', 'SG_UF_PROGRAMA',
-       'NM_MUNICIPIO_PROGRAMA_IES', 'CD_CONCEITO_PROGRAMA',
-       'CD_CONCEITO_CURSO', 'ID_PESSOA', 'TP_DOCUMENTO_DISCENTE',
-       'NR_DOCUMENTO_DISCENTE', 'NM_DISCENTE',
-       'NM_PAIS_NACIONALIDADE_DISCENTE', 'DS_TIPO_NACIONALIDADE_DISCENTE',
-       'AN_NASCIMENTO_DISCENTE', 'DS_FAIXA_ETARIA',
-       'DS_GRAU_ACADEMICO_DISCENTE', 'ST_INGRESSANTE', 'NM_SITUACAO_DISCENTE',
-       'DT_MATRICULA_DISCENTE', 'DT_SITUACAO_DISCENTE', 'QT_MES_TITULACAO',
-       'NM_TESE_DISSERTACAO', 'NM_ORIENTADOR', 'ID_ADD_FOTO_PROGRAMA',
-       'ID_ADD_FOTO_PROGRAMA_IES', 'NM_ORIENTADOR_PRINCIPAL', 'PCPF', 'CHK',
-       'ANO_MATRICULA_DISCENTE', 'IDADE_APROX_DISCENTE']]
-
-st.markdown('##### Quer explorar mais? Que tal baixar os dados?')
-
-csv = filtered_df.to_csv(index=False)
-csv_bytes = csv.encode()
-
-# Use a função st.download_button() para baixar o dataframe como um arquivo csv
-st.download_button(
-    label="Baixar dados como CSV",
-    data=csv_bytes,
-    file_name="dados_filtrados.csv",
-    mime="text/csv",
-)
+        def desenhar_grafico_busca(backend):
+            # Gráfico de linhas dos trabalhos encontrados por ano, uma linha por região
+            contagens = agregados.contagens_ano_dimensao(df, posicoes_busca, 'NM_REGIAO')
+            return backend.linhas(contagens, 'Trabalhos encontrados para "' + consulta + '" por ano e região', cor='NM_REGIAO')
+
+        if len(posicoes_busca):
+            # Para exibir o gráfico no Streamlit, reaproveitando a imagem quando nada mudou
+            exibir_grafico(('linha_busca', estado_filtros, consulta), desenhar_grafico_busca)
+
+            # Os trabalhos mais relevantes, lidos do disco sem manter os textos em memória
+            st.dataframe(trabalhos_encontrados(tuple(posicoes_busca[:busca.LIMITE_RESULTADOS]), assinatura))
+
+
+@secoes.secao(SECOES, 'Pesquisas e orientadores')
+def secao_orientadores():
+    """Quem orienta nossos egressos?"""
+    st.markdown('##### Quem orienta nossos egressos? :books:')
+
+    # Índice de orientadores e quantidade de destaques
+    indice_orientadores = carregar_indice_orientadores(assinatura)
+    quantidade_orientadores = st.slider('Quantos orientadores deseja ver?', min_value=5, max_value=50, value=orientadores.QUANTIDADE_DESTAQUES)
+    mais_egressos, varias_instituicoes = destaques_orientadores(quantidade_orientadores, selecao_regiao, selecao_grau_academico, assinatura)
+
+    st.markdown('Orientadores com mais egressos:')
+    st.dataframe(mais_egressos)
+
+    st.markdown('Orientadores com egressos em mais de uma instituição:')
+    st.dataframe(varias_instituicoes)
+
+    # Painel expansível com a produção anual de um dos orientadores em destaque
+    expander_orientador = st.expander("Deseja ver a produção anual de um desses orientadores?")
+    orientador_selecionado = secoes.escolha_sob_demanda(expander_orientador, 'Selecione um orientador:', mais_egressos['Orientador'].tolist())
+
+
+    def desenhar_grafico_orientador(backend):
+        # Gráfico de linhas com os egressos do orientador por ano, consultando apenas as linhas dele
+        producao = orientadores.producao_anual(indice_orientadores, orientador_selecionado, linhas_filtradas).reset_index(name='counts')
+        return backend.linhas(producao, 'Gráfico de linha de egressos por ano orientados por ' + orientador_selecionado)
+
+
+    if orientador_selecionado:
+        # Para exibir o gráfico no Streamlit, reaproveitando a imagem quando nada mudou
+        exibir_grafico(('linha_orientador', estado_filtros, orientador_selecionado), desenhar_grafico_orientador, expander_orientador)
+
+
+@secoes.secao(SECOES, 'Dados brutos')
+def secao_dados_brutos():
+    """Que tal explorar um pouco mais os dados brutos?"""
+    st.markdown('##### Que tal explorar um pouco mais os dados brutos? :airplane:')
+
+    # A tabela completa só é lida quando alguém pede para ver os dados brutos
+    exibir_dados_brutos = st.checkbox('Carregar os dados brutos')
+
+    if exibir_dados_brutos:
+        colunas_exibidas = st.multiselect('Colunas exibidas:', dados.COLUNAS_BRUTAS, default=list(dados.COLUNAS_BRUTAS))
+        coluna_ordem = st.selectbox('Ordenar por:', ('Ordem original',) + dados.COLUNAS_BRUTAS)
+        ordem_crescente = st.checkbox('Ordem crescente', value=True)
+
+        # A ordenação é feita no servidor, sobre as posições filtradas
+        if coluna_ordem == 'Ordem original':
+            posicoes_exibidas = posicoes_filtradas
+        else:
+            posicoes_exibidas = posicoes_ordenadas(coluna_ordem, ordem_crescente, selecao_regiao, selecao_grau_academico, assinatura)
+
+        tamanho_pagina = st.selectbox('Linhas por página:', explorador.TAMANHOS_PAGINA, index=1)
+        total_paginas = explorador.numero_paginas(len(posicoes_exibidas), tamanho_pagina)
+        numero_pagina = st.number_input('Página:', min_value=1, max_value=total_paginas, value=1, step=1)
+        st.markdown(f'{len(posicoes_exibidas)} egressos selecionados, página {numero_pagina} de {total_paginas}.')
+
+        # Só as linhas e colunas da página são lidas do snapshot e enviadas ao navegador, uma vez por página
+        st.dataframe(pagina_dados_brutos(coluna_ordem, ordem_crescente, numero_pagina, tamanho_pagina, tuple(colunas_exibidas), selecao_regiao, selecao_grau_academico, assinatura))
+
+
+@secoes.secao(SECOES, 'Dados brutos')
+def secao_exportacao():
+    """Quer explorar mais? Que tal baixar os dados?"""
+    st.markdown('##### Quer explorar mais? Que tal baixar os dados?')
+
+    # Formato e colunas do arquivo; colunas largas como o título da tese podem ficar de fora
+    formato_exportacao = st.radio('Formato do arquivo:', tuple(exportacao.FORMATOS))
+    colunas_exportacao = st.multiselect('Colunas do arquivo:', dados.COLUNAS_BRUTAS, default=list(dados.COLUNAS_BRUTAS))
+    colunas_exportacao = [coluna for coluna in dados.COLUNAS_BRUTAS if coluna in colunas_exportacao]
+    extensao, mime, escrever = exportacao.FORMATOS[formato_exportacao]
+
+    # Tudo que muda o conteúdo do arquivo exportado
+    chave_exportacao = ('exportacao', formato_exportacao, tuple(colunas_exportacao), estado_filtros)
+
+
+    def escrever_arquivo_filtrado(arquivo):
+        # Só roda quando o arquivo desta seleção ainda não está em disco
+        # Só as colunas do arquivo, um grupo de linhas do snapshot por vez, então a memória não cresce com a seleção
+        escrever(dados.ler_lotes(posicoes_filtradas, colunas_exportacao), arquivo)
+
+
+    # O arquivo só é gerado quando alguém pede, e fica guardado em disco por seleção
+    if not colunas_exportacao:
+        st.info('Escolha ao menos uma coluna para baixar os dados filtrados.')
+    elif st.button('Preparar arquivo'):
+        st.session_state['exportacao'] = chave_exportacao
+
+    if st.session_state.get('exportacao') == chave_exportacao:
+        # Use a função st.download_button() para baixar o arquivo, gerado de novo se outra sessão o apagou
+        with exportacao.abrir(chave_exportacao, extensao, escrever_arquivo_filtrado) as arquivo:
+            st.download_button(
+                label="Baixar dados como " + formato_exportacao,
+                data=arquivo,
+                file_name="dados_filtrados." + extensao,
+                mime=mime,
+            )
+
+
+# Só as seções da página escolhida na barra lateral são executadas
+pagina = navegacao.radio('Escolha a página:', secoes.paginas(SECOES))
+secoes.executar(SECOES, pagina)
+
+# Fim da execução medida; o painel de desempenho abaixo não entra na medição
+metricas.finalizar_execucao()
+
+# Painel de desempenho das últimas execuções, visível só ao abrir o painel com ?admin=<token>
+if metricas.administrador(st.experimental_get_query_params().get('admin', [''])[0]):
+    with st.expander('Desempenho das últimas execuções'):
+        execucoes = metricas.ultimas_execucoes()
+        if not execucoes:
+            st.info('Nenhuma execução medida ainda; a medição pode estar desligada por DOCENCIA_METRICAS=0.')
+        else:
+            # Segundos de cada seção por execução e o gráfico de chamas da execução escolhida
+            st.dataframe(metricas.resumo(execucoes))
+            rotulos_execucoes = [f"{i + 1}. {e['data']:%H:%M:%S} ({e['total']:.2f}s)" for i, e in enumerate(execucoes)]
+            execucao_escolhida = st.selectbox('Execução detalhada:', rotulos_execucoes)
+            st.image(graficos.figura_para_png(graficos.chamas(execucoes[rotulos_execucoes.index(execucao_escolhida)])), use_column_width=True)
@@ -0,0 +1,228 @@
+import numpy as np
+import pandas as pd
+
+import metricas
+
+# Chaves dos filtros da barra lateral e da seleção de universidade
+CHAVES_CUBO = ['AN_BASE', 'NM_REGIAO', 'DS_GRAU_ACADEMICO_DISCENTE', 'NM_ENTIDADE_ENSINO']
+
+# Dimensões exibidas nos gráficos de barras empilhadas
+DIMENSOES = (
+    'NM_REGIAO', 'DS_DEPENDENCIA_ADMINISTRATIVA', 'CS_STATUS_JURIDICO',
+    'CD_CONCEITO_PROGRAMA', 'DS_TIPO_NACIONALIDADE_DISCENTE',
+)
+
+# Colunas numéricas resumidas por ano nos boxplots
+COLUNAS_DISTRIBUICAO = ['IDADE_APROX_DISCENTE', 'QT_MES_TITULACAO']
+
+# Máximo de outliers guardados por caixa; o excedente é descartado por amostragem
+LIMITE_OUTLIERS = 200
+
+
+def construir_cubos(df):
+    """Conta os egressos uma única vez por (chaves do cubo, dimensão), para cada dimensão."""
+    cubos = {}
+    for dimensao in DIMENSOES:
+        chaves = CHAVES_CUBO if dimensao in CHAVES_CUBO else CHAVES_CUBO + [dimensao]
+        cubos[dimensao] = df.groupby(chaves, observed=True).size().reset_index(name='counts')
+    return cubos
+
+
+def fatiar_cubo(cubo, regioes, graus_academicos, universidade=None):
+    """Seleciona as células do cubo que atendem aos filtros da barra lateral."""
+    mascara = cubo['NM_REGIAO'].isin(regioes) & cubo['DS_GRAU_ACADEMICO_DISCENTE'].isin(graus_academicos)
+    if universidade is not None:
+        mascara &= cubo['NM_ENTIDADE_ENSINO'] == universidade
+    return cubo[mascara]
+
+
+@metricas.medido
+def tabela_dimensao(cubos, dimensao, regioes, graus_academicos, universidade=None):
+    """Retorna as tabelas (ano x dimensão) em valores absolutos e em porcentagem."""
+    fatia = fatiar_cubo(cubos[dimensao], regioes, graus_academicos, universidade)
+
+    # Soma as células do cubo em vez de reagrupar as linhas brutas
+    pivot_df = fatia.groupby(['AN_BASE', dimensao], observed=True)['counts'].sum().unstack(fill_value=0)
+
+    # Normalizando as contagens para obter porcentagens
+    pivot_df_percentage = pivot_df.divide(pivot_df.sum(axis=1), axis=0) * 100
+
+    return pivot_df, pivot_df_percentage
+
+
+def construir_histogramas(df):
+    """Histogramas mergeáveis (contagem por valor inteiro) de cada célula do cubo, para cada coluna de distribuição.
+
+    Somar os histogramas das células selecionadas dá a distribuição de qualquer combinação de filtros
+    sem voltar às linhas brutas. Para valores inteiros, como idades e meses, o resultado é exato.
+    """
+    histogramas = {}
+    for coluna in COLUNAS_DISTRIBUICAO:
+        celulas = df[CHAVES_CUBO].assign(valor=df[coluna].round())
+        histogramas[coluna] = celulas.groupby(CHAVES_CUBO + ['valor'], observed=True).size().reset_index(name='counts')
+    return histogramas
+
+
+def listar_universidades(cubos, regioes, graus_academicos):
+    """Universidades com egressos na seleção da barra lateral, em ordem alfabética."""
+    fatia = fatiar_cubo(cubos['NM_REGIAO'], regioes, graus_academicos)
+    return sorted(fatia['NM_ENTIDADE_ENSINO'].unique().tolist())
+
+
+def construir_indice_universidades(df):
+    """Agrupa uma única vez as posições de cada universidade, com contagens e boxplots anuais.
+
+    As posições ficam em um único vetor, ordenado por universidade, com o início do trecho de cada uma;
+    assim elas podem ser gravadas e mapeadas em memória como os bitmaps. Os resumos anuais, pequenos,
+    ficam em um dicionário por universidade.
+    """
+    chaves = ['NM_ENTIDADE_ENSINO', 'AN_BASE']
+    contagens = df.groupby(chaves, observed=True).size()
+
+    # Boxplots de todas as universidades em uma única passada, agrupando por (universidade, ano)
+    todas = np.arange(len(df))
+    boxplots = {coluna: {} for coluna in COLUNAS_DISTRIBUICAO}
+    for coluna in COLUNAS_DISTRIBUICAO:
+        for caixa in estatisticas_boxplot(df, todas, coluna, chaves):
+            universidade, caixa['label'] = caixa['label']
+            boxplots[coluna].setdefault(universidade, []).append(caixa)
+
+    grupos = df.groupby('NM_ENTIDADE_ENSINO', observed=True).indices
+    nomes = sorted(grupos)
+    tamanhos = [len(grupos[universidade]) for universidade in nomes]
+
+    return {
+        'nomes': nomes,
+        'codigos': {universidade: codigo for codigo, universidade in enumerate(nomes)},
+        'inicios': np.concatenate([[0], np.cumsum(tamanhos)]).astype('int64'),
+        'posicoes': np.concatenate([grupos[universidade] for universidade in nomes] or [[]]).astype('int64'),
+        'resumos': {
+            universidade: {
+                'contagens_ano': contagens.xs(universidade, level='NM_ENTIDADE_ENSINO'),
+                'boxplots_ano': {coluna: boxplots[coluna].get(universidade, []) for coluna in COLUNAS_DISTRIBUICAO},
+            }
+            for universidade in nomes
+        },
+    }
+
+
+def linhas_universidade(indice_universidades, universidade):
+    """Todas as posições da universidade: o trecho dela no vetor único de posições."""
+    codigo = indice_universidades['codigos'][universidade]
+    inicios = indice_universidades['inicios']
+    return indice_universidades['posicoes'][inicios[codigo]:inicios[codigo + 1]]
+
+
+def posicoes_universidade(indice_universidades, universidade, linhas_selecionadas):
+    """Posições da universidade que também atendem aos filtros, olhando só as linhas dela."""
+    posicoes = linhas_universidade(indice_universidades, universidade)
+    return posicoes[linhas_selecionadas[posicoes]]
+
+
+def contagens_ano(df, posicoes):
+    """Contagem de egressos por ano nas linhas indicadas."""
+    anos = df['AN_BASE'].take(posicoes)
+    return anos.groupby(anos).size()
+
+
+def contagens_ano_dimensao(df, posicoes, dimensao):
+    """Contagem de egressos por ano e valor da dimensão nas linhas indicadas."""
+    linhas = df[['AN_BASE', dimensao]].take(posicoes)
+    return linhas.groupby(['AN_BASE', dimensao], observed=True).size().reset_index(name='counts')
+
+
+def contagens_ano_universidade(indice_universidades, universidade, df, linhas_selecionadas):
+    """Contagem anual da universidade, reaproveitando a pré-calculada quando o filtro não a restringe."""
+    posicoes = posicoes_universidade(indice_universidades, universidade, linhas_selecionadas)
+    if len(posicoes) == len(linhas_universidade(indice_universidades, universidade)):
+        return indice_universidades['resumos'][universidade]['contagens_ano']
+    return contagens_ano(df, posicoes)
+
+
+@metricas.medido
+def estatisticas_boxplot(df, posicoes, coluna, chaves=('AN_BASE',), limite_outliers=LIMITE_OUTLIERS):
+    """Quartis, bigodes e uma amostra limitada de outliers por grupo, no formato de Axes.bxp.
+
+    Tudo é calculado em uma única passada vetorizada. Os outliers são sempre guardados;
+    quem desenha decide se eles aparecem.
+    """
+    linhas = df.iloc[posicoes, df.columns.get_indexer(list(chaves) + [coluna])]
+
+    # Linhas sem valor ou sem chave não entram em nenhuma caixa; uma chave ausente quebraria o ngroup
+    linhas = linhas.dropna(subset=list(chaves) + [coluna])
+    if len(linhas) == 0:
+        return []
+    valores = linhas[coluna].to_numpy(dtype='float64')
+    agrupado = linhas.groupby(list(chaves), observed=True)[coluna]
+
+    quartis = agrupado.quantile([0.25, 0.5, 0.75]).unstack()
+    q1, mediana, q3 = (quartis[q].to_numpy(dtype='float64') for q in (0.25, 0.5, 0.75))
+
+    # Limites de Tukey (1,5 x IQR) de cada grupo, repetidos para cada linha
+    grupo = agrupado.ngroup().to_numpy()
+    iqr = q3 - q1
+    dentro = (valores >= (q1 - 1.5 * iqr)[grupo]) & (valores <= (q3 + 1.5 * iqr)[grupo])
+
+    bigodes = pd.DataFrame({'grupo': grupo[dentro], 'valor': valores[dentro]}).groupby('grupo')['valor'].agg(['min', 'max'])
+
+    # Amostra reprodutível de no máximo limite_outliers outliers por grupo
+    fora = pd.DataFrame({'grupo': grupo[~dentro], 'valor': valores[~dentro]})
+    fora = fora.sample(frac=1, random_state=0).groupby('grupo').head(limite_outliers)
+    outliers = {g: tabela['valor'].to_numpy() for g, tabela in fora.groupby('grupo')}
+
+    estatisticas = []
+    for g, rotulo in enumerate(quartis.index):
+        estatisticas.append({
+            'label': rotulo if isinstance(rotulo, tuple) else int(rotulo),
+            'q1': q1[g], 'med': mediana[g], 'q3': q3[g],
+            'whislo': bigodes.at[g, 'min'], 'whishi': bigodes.at[g, 'max'],
+            'fliers': outliers.get(g, np.empty(0)),
+        })
+    return estatisticas
+
+
+def boxplot_universidade(indice_universidades, universidade, df, linhas_selecionadas, coluna):
+    """Boxplots anuais da universidade, reaproveitando os pré-calculados quando o filtro não a restringe."""
+    posicoes = posicoes_universidade(indice_universidades, universidade, linhas_selecionadas)
+    if len(posicoes) == len(linhas_universidade(indice_universidades, universidade)):
+        return indice_universidades['resumos'][universidade]['boxplots_ano'][coluna]
+    return estatisticas_boxplot(df, posicoes, coluna)
+
+
+def _caixa_histograma(rotulo, valores, pesos, limite_outliers):
+    """Estatísticas de uma caixa a partir de um histograma (valores ordenados e suas contagens)."""
+    acumulado = np.cumsum(pesos)
+    n = acumulado[-1]
+
+    def quantil(q):
+        # Mesma interpolação linear de np.percentile, localizando as posições no acumulado
+        h = (n - 1) * q
+        abaixo = valores[np.searchsorted(acumulado, np.floor(h), side='right')]
+        acima = valores[np.searchsorted(acumulado, np.ceil(h), side='right')]
+        return abaixo + (h - np.floor(h)) * (acima - abaixo)
+
+    q1, mediana, q3 = quantil(0.25), quantil(0.5), quantil(0.75)
+    iqr = q3 - q1
+    dentro = (valores >= q1 - 1.5 * iqr) & (valores <= q3 + 1.5 * iqr)
+
+    outliers = np.repeat(valores[~dentro], pesos[~dentro])
+    if len(outliers) > limite_outliers:
+        outliers = np.random.RandomState(0).choice(outliers, limite_outliers, replace=False)
+
+    return {
+        'label': int(rotulo), 'q1': q1, 'med': mediana, 'q3': q3,
+        'whislo': valores[dentro].min(), 'whishi': valores[dentro].max(), 'fliers': outliers,
+    }
+
+
+@metricas.medido
+def estatisticas_histograma(histograma, regioes, graus_academicos, universidade=None, limite_outliers=LIMITE_OUTLIERS):
+    """Boxplots por ano mesclando os histogramas das células que atendem aos filtros."""
+    fatia = fatiar_cubo(histograma, regioes, graus_academicos, universidade)
+    contagens = fatia.groupby(['AN_BASE', 'valor'], observed=True)['counts'].sum()
+
+    estatisticas = []
+    for ano, por_valor in contagens.groupby(level='AN_BASE'):
+        valores = por_valor.index.get_level_values('valor').to_numpy(dtype='float64')
+        estatisticas.append(_caixa_histograma(ano, valores, por_valor.to_numpy(), limite_outliers))
+    return estatisticas
@@ -0,0 +1,212 @@
+import argparse
+import asyncio
+import functools
+import hashlib
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+import tornado.ioloop
+import tornado.web
+
+import agregados
+import compartilhado
+import dados
+import filtros
+
+# Endereço e porta padrão: só a máquina local, ao lado da porta 8501 do Streamlit
+ENDERECO = '127.0.0.1'
+PORTA = 8502
+
+# Respostas guardadas em memória; consultas repetidas custam só a busca no dicionário
+RESPOSTAS_GUARDADAS = 256
+
+# Formatos de resposta e seus tipos de conteúdo
+FORMATOS = {
+    'json': 'application/json; charset=utf-8',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+# Respostas prontas (ou em cálculo) por consulta, da menos para a mais recentemente usada
+_respostas = OrderedDict()
+
+
+@functools.lru_cache(maxsize=1)
+def carregar_compartilhado(assinatura):
+    """Os mesmos artefatos do painel, mapeados dos arquivos publicados da versão; só a versão atual fica aberta."""
+    return compartilhado.anexar(assinatura)
+
+
+def valores_filtro(artefatos, coluna, pedidos):
+    """Valores pedidos de um filtro da barra lateral, ou todos quando nenhum foi pedido, como no painel."""
+    conhecidos = artefatos['cubos']['NM_REGIAO'][coluna].unique().tolist()
+    desconhecidos = sorted(set(pedidos) - set(conhecidos))
+    if desconhecidos:
+        raise tornado.web.HTTPError(400, 'Valores desconhecidos para %s: %s', coluna, ', '.join(desconhecidos))
+    return list(pedidos) or conhecidos
+
+
+def universidade_valida(artefatos, universidade):
+    """Confere se a universidade existe nos dados publicados."""
+    if universidade is not None and universidade not in artefatos['indice_universidades']['codigos']:
+        raise tornado.web.HTTPError(404, 'Universidade desconhecida: %s', universidade)
+    return universidade
+
+
+def consulta_dimensao(artefatos, dimensao, regioes, graus_academicos, universidade):
+    """Contagens e porcentagens por ano e valor da dimensão, as mesmas das barras empilhadas."""
+    if dimensao not in agregados.DIMENSOES:
+        raise tornado.web.HTTPError(404, 'Dimensão desconhecida: %s', dimensao)
+    pivot_df, pivot_df_percentage = agregados.tabela_dimensao(artefatos['cubos'], dimensao, regioes, graus_academicos, universidade)
+
+    tabela = pd.DataFrame({'contagem': pivot_df.stack(), 'porcentagem': pivot_df_percentage.stack()})
+    tabela = tabela.rename_axis(['ano', 'categoria']).reset_index()
+    return tabela.astype({'ano': 'int64', 'categoria': 'str', 'contagem': 'int64'})
+
+
+def consulta_boxplot(artefatos, coluna, regioes, graus_academicos, universidade):
+    """Quartis, bigodes e outliers por ano, mesclados dos histogramas como no modo padrão do painel."""
+    if coluna not in agregados.COLUNAS_DISTRIBUICAO:
+        raise tornado.web.HTTPError(404, 'Coluna desconhecida: %s', coluna)
+    estatisticas = agregados.estatisticas_histograma(artefatos['histogramas'][coluna], regioes, graus_academicos, universidade)
+
+    return pd.DataFrame({
+        'ano': [int(e['label']) for e in estatisticas],
+        'q1': [float(e['q1']) for e in estatisticas],
+        'mediana': [float(e['med']) for e in estatisticas],
+        'q3': [float(e['q3']) for e in estatisticas],
+        'minimo': [float(e['whislo']) for e in estatisticas],
+        'maximo': [float(e['whishi']) for e in estatisticas],
+        'outliers': [sorted(float(v) for v in e['fliers']) for e in estatisticas],
+    }, columns=['ano', 'q1', 'mediana', 'q3', 'minimo', 'maximo', 'outliers'])
+
+
+def consulta_universidades(artefatos, alvo, regioes, graus_academicos, universidade):
+    """Universidades com egressos na seleção, em ordem alfabética."""
+    return pd.DataFrame({'universidade': agregados.listar_universidades(artefatos['cubos'], regioes, graus_academicos)})
+
+
+def consulta_serie(artefatos, alvo, regioes, graus_academicos, universidade):
+    """Contagem anual de egressos de uma universidade, consultando apenas as linhas dela."""
+    if universidade is None:
+        raise tornado.web.HTTPError(400, 'Informe a universidade')
+    selecoes = {'NM_REGIAO': regioes, 'DS_GRAU_ACADEMICO_DISCENTE': graus_academicos}
+    linhas = filtros.linhas_selecionadas(artefatos['indice_filtros'], selecoes)
+    contagens = agregados.contagens_ano_universidade(artefatos['indice_universidades'], universidade, artefatos['dados'], linhas)
+    return contagens.rename_axis('ano').reset_index(name='contagem').astype('int64')
+
+
+# Consultas expostas, pelo primeiro trecho do caminho
+CONSULTAS = {
+    'dimensoes': consulta_dimensao,
+    'boxplots': consulta_boxplot,
+    'universidades': consulta_universidades,
+    'series': consulta_serie,
+}
+
+
+def serializar(tabela, formato):
+    """Corpo da resposta: registros JSON ou um fluxo Arrow IPC."""
+    if formato == 'arrow':
+        tabela_arrow = pa.Table.from_pandas(tabela, preserve_index=False)
+        saida = pa.BufferOutputStream()
+        with pa.ipc.new_stream(saida, tabela_arrow.schema) as escritor:
+            escritor.write_table(tabela_arrow)
+        return saida.getvalue().to_pybytes()
+    return tabela.to_json(orient='records', force_ascii=False).encode('utf-8')
+
+
+def calcular(chave):
+    """Executa a consulta descrita pela chave e serializa o resultado; roda fora do laço de eventos."""
+    consulta, alvo, regioes, graus_academicos, universidade, formato, assinatura = chave
+    artefatos = carregar_compartilhado(assinatura)
+    regioes = valores_filtro(artefatos, 'NM_REGIAO', regioes)
+    graus_academicos = valores_filtro(artefatos, 'DS_GRAU_ACADEMICO_DISCENTE', graus_academicos)
+    universidade = universidade_valida(artefatos, universidade)
+    return serializar(CONSULTAS[consulta](artefatos, alvo, regioes, graus_academicos, universidade), formato)
+
+
+def etag(chave):
+    """ETag da consulta: o resultado depende só da chave, que inclui a versão dos dados, então não é preciso calculá-lo."""
+    return '"%s"' % hashlib.sha1(repr(chave).encode()).hexdigest()[:24]
+
+
+async def resposta(chave):
+    """Corpo da resposta, calculado uma única vez por chave mesmo com pedidos simultâneos."""
+    futuro = _respostas.get(chave)
+    if futuro is None:
+        futuro = asyncio.get_running_loop().run_in_executor(None, calcular, chave)
+        _respostas[chave] = futuro
+        while len(_respostas) > RESPOSTAS_GUARDADAS:
+            _respostas.popitem(last=False)
+    else:
+        _respostas.move_to_end(chave)
+
+    try:
+        return await futuro
+    except Exception:
+        # Erros não ficam guardados: a próxima consulta igual tenta de novo
+        if _respostas.get(chave) is futuro:
+            del _respostas[chave]
+        raise
+
+
+class Consulta(tornado.web.RequestHandler):
+    """GET /<consulta>[/<alvo>]?regiao=...&grau=...&universidade=...&formato=json|arrow"""
+
+    etag_consulta = None
+
+    def compute_etag(self):
+        return self.etag_consulta
+
+    async def get(self, consulta, alvo=None):
+        formato = self.get_query_argument('formato', 'json')
+        if formato not in FORMATOS:
+            raise tornado.web.HTTPError(400, 'Formato desconhecido: %s', formato)
+
+        # Os filtros entram na chave sem repetição e em ordem, para que a mesma seleção seja a mesma consulta
+        chave = (
+            consulta, alvo,
+            tuple(sorted(set(self.get_query_arguments('regiao')))),
+            tuple(sorted(set(self.get_query_arguments('grau')))),
+            self.get_query_argument('universidade', None),
+            formato,
+            dados.assinatura_dados(),
+        )
+
+        # A versão dos dados está na ETag; o cliente sempre revalida e recebe 304 sem nada ser calculado
+        self.etag_consulta = etag(chave)
+        self.set_header('Cache-Control', 'no-cache')
+        self.set_etag_header()
+        if self.check_etag_header():
+            self.set_status(304)
+            return
+
+        corpo = await resposta(chave)
+        self.set_header('Content-Type', FORMATOS[formato])
+        self.write(corpo)
+
+    def write_error(self, status_code, **kwargs):
+        erro = kwargs.get('exc_info', (None, None))[1]
+        if isinstance(erro, tornado.web.HTTPError) and erro.log_message:
+            mensagem = erro.log_message % erro.args
+        else:
+            mensagem = self._reason
+        self.finish({'erro': mensagem})
+
+
+def aplicacao():
+    """Aplicação com as rotas das consultas."""
+    consultas = '|'.join(CONSULTAS)
+    return tornado.web.Application([(rf'/({consultas})(?:/(\w+))?/?', Consulta)])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve em JSON ou Arrow os agregados do painel, a partir dos mesmos artefatos publicados.')
+    parser.add_argument('--endereco', default=ENDERECO, help='endereço de escuta (padrão: só a máquina local)')
+    parser.add_argument('--porta', type=int, default=PORTA, help='porta de escuta')
+    args = parser.parse_args()
+
+    aplicacao().listen(args.porta, args.endereco)
+    print(f'Consultas em http://{args.endereco}:{args.porta}/ ({", ".join(CONSULTAS)})')
+    tornado.ioloop.IOLoop.current().start()
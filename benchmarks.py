@@ -0,0 +1,306 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import agregados
+import dados
+import exportacao
+import filtros
+import graficos
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+# Linhas do conjunto sintético na escala 1; as escalas multiplicam este valor
+LINHAS_BASE = 10_000
+
+ESCALAS = (1, 10, 100)
+
+REPETICOES = 5
+
+PERCENTIS = (50, 90, 99)
+
+# Filtro típico da barra lateral: três regiões e dois graus acadêmicos
+SELECAO = {
+    'NM_REGIAO': ['SUDESTE', 'SUL', 'NORDESTE'],
+    'DS_GRAU_ACADEMICO_DISCENTE': ['MESTRADO', 'DOUTORADO'],
+}
+
+# Valores das colunas com domínio conhecido; as demais recebem rótulos genéricos
+REGIOES = ['SUDESTE', 'SUL', 'NORDESTE', 'NORTE', 'CENTRO-OESTE']
+GRAUS = ['MESTRADO', 'DOUTORADO', 'MESTRADO PROFISSIONAL']
+STATUS_JURIDICO = ['FEDERAL', 'ESTADUAL', 'MUNICIPAL', 'PARTICULAR']
+PALAVRAS = [
+    'aprendizado', 'máquina', 'redes', 'neurais', 'otimização', 'grafos', 'segurança',
+    'computação', 'visão', 'dados', 'software', 'sistemas', 'distribuídos', 'modelo',
+    'avaliação', 'algoritmos', 'ensino', 'saúde', 'energia', 'linguagem', 'natural',
+]
+
+ETAPAS = (
+    'script_completo_frio', 'script_completo', 'leitura_csv', 'leitura_snapshot',
+    'filtro_isin', 'filtro_bitmaps', 'barras_groupby_pivot', 'barras_cubos', 'render_barras',
+    'boxplot', 'boxplot_histogramas', 'exportacao_to_csv', 'exportacao_lotes',
+)
+
+
+def gerar_dados(linhas, semente=0):
+    """DataFrame sintético com as colunas e as cardinalidades aproximadas do CSV da CAPES."""
+    gerador = np.random.default_rng(semente)
+
+    def escolher(valores, pesos=None):
+        return gerador.choice(valores, linhas, p=pesos)
+
+    def rotulos(coluna, quantidade):
+        return escolher([f'{coluna} {i}' for i in range(quantidade)])
+
+    # Universidades e programas crescem com os dados, como acontece ao somar anos e áreas
+    universidades = max(60, linhas // 250)
+    orientadores = max(300, linhas // 8)
+
+    colunas = {coluna: rotulos(coluna, 20) for coluna in dados.COLUNAS_BRUTAS}
+    colunas.update({
+        'AN_BASE': gerador.integers(2013, 2021, linhas),
+        'NM_REGIAO': escolher(REGIOES, [0.45, 0.2, 0.2, 0.05, 0.1]),
+        'DS_GRAU_ACADEMICO_DISCENTE': escolher(GRAUS, [0.6, 0.3, 0.1]),
+        'NM_ENTIDADE_ENSINO': rotulos('UNIVERSIDADE', universidades),
+        'CD_PROGRAMA_IES': rotulos('PROGRAMA', universidades * 10),
+        'NM_PROGRAMA_IES': rotulos('PROGRAMA', universidades * 10),
+        'CS_STATUS_JURIDICO': escolher(STATUS_JURIDICO),
+        'DS_DEPENDENCIA_ADMINISTRATIVA': escolher(['PÚBLICA', 'PRIVADA'], [0.8, 0.2]),
+        'CD_CONCEITO_PROGRAMA': gerador.integers(3, 8, linhas),
+        'DS_TIPO_NACIONALIDADE_DISCENTE': escolher(['BRASILEIRO', 'ESTRANGEIRO'], [0.9, 0.1]),
+        'ID_PESSOA': gerador.permutation(linhas) + 1,
+        'IDADE_APROX_DISCENTE': np.clip(gerador.normal(32, 7, linhas).round(), 21, 75),
+        'QT_MES_TITULACAO': np.clip(gerador.normal(30, 10, linhas).round(), 6, 96),
+        'DT_MATRICULA_DISCENTE': '01MAR2015:00:00:00',
+        'DT_SITUACAO_DISCENTE': '01MAR2017:00:00:00',
+        'NM_ORIENTADOR': rotulos('ORIENTADOR', orientadores),
+    })
+    colunas['NM_ORIENTADOR_PRINCIPAL'] = colunas['NM_ORIENTADOR']
+
+    # Títulos de seis palavras sorteadas de um vocabulário pequeno
+    sorteio = gerador.integers(0, len(PALAVRAS), (linhas, 6))
+    colunas['NM_TESE_DISSERTACAO'] = [' '.join(PALAVRAS[i] for i in linha) for linha in sorteio]
+
+    return pd.DataFrame(colunas, columns=list(dados.COLUNAS_BRUTAS))
+
+
+def medir(funcao, repeticoes):
+    """Mede os tempos de cada repetição e, numa execução à parte, o pico de memória alocada."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    # O tracemalloc deixa a execução mais lenta, por isso não entra na medida de tempo
+    tracemalloc.start()
+    try:
+        funcao()
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return tempos, pico
+
+
+def executar_script(diretorio, script):
+    """Executa o painel sem o servidor do Streamlit e devolve o pico de memória residente do processo, em bytes."""
+    codigo = (
+        'import runpy, sys\n'
+        'try:\n'
+        '    runpy.run_path(sys.argv[1], run_name="__main__")\n'
+        'finally:\n'
+        '    try:\n'
+        '        import resource\n'
+        '        print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n'
+        '    except ImportError:\n'
+        '        print(-1)\n'
+    )
+    ambiente = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [DIRETORIO, os.environ.get('PYTHONPATH')])))
+    saida = subprocess.run([sys.executable, '-c', codigo, script], cwd=diretorio, env=ambiente,
+                           stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True, text=True)
+
+    # Sem o módulo resource (Windows) o pico não é medido
+    pico = int(saida.stdout.split()[-1])
+    if pico < 0:
+        return None
+    # ru_maxrss vem em kilobytes no Linux e em bytes no macOS
+    return pico if sys.platform == 'darwin' else pico * 1024
+
+
+def medir_script(diretorio, script, repeticoes):
+    """Tempos e pico de memória do script completo; cada execução é um processo novo."""
+    tempos, picos = [], []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        picos.append(executar_script(diretorio, script))
+        tempos.append(time.perf_counter() - inicio)
+    return tempos, None if None in picos else max(picos)
+
+
+def etapas_em_memoria(caminho_csv, caminho_snapshot):
+    """Funções sem argumentos de cada etapa medida dentro do processo, na ordem de ETAPAS."""
+    df = dados.ler_csv(caminho_csv)
+    df_graficos = df[list(dados.COLUNAS_GRAFICOS)]
+    regioes, graus = SELECAO['NM_REGIAO'], SELECAO['DS_GRAU_ACADEMICO_DISCENTE']
+
+    indice = filtros.construir_indice(df_graficos)
+    cubos = agregados.construir_cubos(df_graficos)
+    histogramas = agregados.construir_histogramas(df_graficos)
+    posicoes = filtros.selecionar(indice, SELECAO)
+
+    def filtro_isin():
+        return df_graficos[df_graficos['NM_REGIAO'].isin(regioes) & df_graficos['DS_GRAU_ACADEMICO_DISCENTE'].isin(graus)]
+
+    filtrado = filtro_isin()
+
+    def barras_groupby_pivot():
+        # Caminho original do painel: reagrupa as linhas filtradas a cada execução
+        grouped_df = filtrado.groupby(['AN_BASE', 'NM_REGIAO'], observed=True).size().reset_index(name='counts')
+        pivot_df = grouped_df.pivot(index='AN_BASE', columns='NM_REGIAO', values='counts').fillna(0)
+        return pivot_df.divide(pivot_df.sum(axis=1), axis=0) * 100
+
+    def render_barras():
+        tabelas = agregados.tabela_dimensao(cubos, 'NM_REGIAO', regioes, graus)
+        return graficos.figura_para_png(graficos.barras_empilhadas(tabelas, 'NM_REGIAO', 'Valores absolutos'))
+
+    def exportacao_lotes():
+        with open(os.devnull, 'wb') as destino:
+            exportacao.escrever_csv(exportacao.lotes_memoria(df, posicoes), destino)
+
+    return {
+        'leitura_csv': lambda: dados.ler_csv(caminho_csv),
+        'leitura_snapshot': lambda: dados.carregar(dados.COLUNAS_GRAFICOS, caminho_csv, caminho_snapshot),
+        'filtro_isin': filtro_isin,
+        'filtro_bitmaps': lambda: filtros.selecionar(indice, SELECAO),
+        'barras_groupby_pivot': barras_groupby_pivot,
+        'barras_cubos': lambda: agregados.tabela_dimensao(cubos, 'NM_REGIAO', regioes, graus),
+        'render_barras': render_barras,
+        'boxplot': lambda: agregados.estatisticas_boxplot(df_graficos, posicoes, 'IDADE_APROX_DISCENTE'),
+        'boxplot_histogramas': lambda: agregados.estatisticas_histograma(histogramas['IDADE_APROX_DISCENTE'], regioes, graus),
+        'exportacao_to_csv': lambda: df[df['NM_REGIAO'].isin(regioes) & df['DS_GRAU_ACADEMICO_DISCENTE'].isin(graus)].to_csv(index=False),
+        'exportacao_lotes': exportacao_lotes,
+    }
+
+
+def resumir(escala, linhas, etapa, tempos, pico):
+    """Uma linha do resultado: percentis de latência em segundos e pico de memória em MB."""
+    resultado = {'escala': escala, 'linhas': linhas, 'etapa': etapa, 'repeticoes': len(tempos)}
+    for percentil in PERCENTIS:
+        resultado[f'p{percentil}_s'] = round(float(np.percentile(tempos, percentil)), 6)
+    resultado['media_s'] = round(float(np.mean(tempos)), 6)
+    resultado['pico_memoria_mb'] = None if pico is None else round(pico / 2**20, 2)
+    return resultado
+
+
+def medir_escala(escala, linhas_base=LINHAS_BASE, repeticoes=REPETICOES, etapas=ETAPAS, script=None):
+    """Gera o conjunto sintético da escala em um diretório temporário e mede as etapas pedidas."""
+    script = script or os.path.join(DIRETORIO, 'App.py')
+    linhas = linhas_base * escala
+    resultados = []
+
+    with tempfile.TemporaryDirectory(prefix='docencia_benchmark_') as diretorio:
+        caminho_csv = os.path.join(diretorio, dados.ARQUIVO_DADOS)
+        caminho_snapshot = os.path.join(diretorio, dados.ARQUIVO_SNAPSHOT)
+        gerar_dados(linhas).to_csv(caminho_csv, index=False)
+
+        # A primeira execução encontra o diretório vazio e gera snapshot, índices e artefatos
+        if 'script_completo_frio' in etapas:
+            tempos, pico = medir_script(diretorio, script, 1)
+            resultados.append(resumir(escala, linhas, 'script_completo_frio', tempos, pico))
+        if 'script_completo' in etapas:
+            executar_script(diretorio, script)
+            tempos, pico = medir_script(diretorio, script, repeticoes)
+            resultados.append(resumir(escala, linhas, 'script_completo', tempos, pico))
+
+        if not dados.snapshot_valido(caminho_csv, caminho_snapshot):
+            dados.gerar_snapshot(caminho_csv, caminho_snapshot)
+
+        funcoes = etapas_em_memoria(caminho_csv, caminho_snapshot)
+        for etapa in etapas:
+            if etapa in funcoes:
+                tempos, pico = medir(funcoes[etapa], repeticoes)
+                resultados.append(resumir(escala, linhas, etapa, tempos, pico))
+
+    return resultados
+
+
+def commit_atual():
+    """Hash curto do commit em que o código medido está, para comparar execuções entre commits."""
+    try:
+        saida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=DIRETORIO,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecido'
+    return saida.stdout.strip()
+
+
+def executar(escalas=ESCALAS, linhas_base=LINHAS_BASE, repeticoes=REPETICOES, etapas=ETAPAS):
+    """Mede todas as escalas e devolve o relatório completo, pronto para ser gravado em JSON."""
+    resultados = []
+    for escala in escalas:
+        resultados.extend(medir_escala(escala, linhas_base, repeticoes, etapas))
+
+    return {
+        'commit': commit_atual(),
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+        },
+        'linhas_base': linhas_base,
+        'resultados': resultados,
+    }
+
+
+def comparar(atual, anterior, percentil=50):
+    """Razão entre as latências do relatório atual e de um anterior, por escala e etapa."""
+    chave = f'p{percentil}_s'
+    referencia = {(r['escala'], r['etapa']): r[chave] for r in anterior['resultados']}
+    razoes = {}
+    for r in atual['resultados']:
+        antes = referencia.get((r['escala'], r['etapa']))
+        if antes:
+            razoes[(r['escala'], r['etapa'])] = r[chave] / antes
+    return razoes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mede carga, filtros, agregações, gráficos e exportação do painel com dados sintéticos.')
+    parser.add_argument('--escalas', type=int, nargs='+', default=list(ESCALAS), help='multiplicadores de --linhas-base')
+    parser.add_argument('--linhas-base', type=int, default=LINHAS_BASE, help='linhas do conjunto na escala 1')
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES, help='execuções medidas por etapa')
+    parser.add_argument('--etapas', nargs='+', choices=ETAPAS, default=list(ETAPAS), help='etapas medidas')
+    parser.add_argument('--saida', default=None, help='arquivo JSON de resultados (padrão: benchmark-<commit>.json)')
+    parser.add_argument('--comparar', default=None, help='JSON de uma execução anterior para comparar as medianas')
+    args = parser.parse_args()
+
+    relatorio = executar(args.escalas, args.linhas_base, args.repeticoes, args.etapas)
+    saida = args.saida or f'benchmark-{relatorio["commit"]}.json'
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+
+    print(f'{"escala":>6} {"linhas":>10} {"etapa":<22} {"p50 (s)":>10} {"p90 (s)":>10} {"p99 (s)":>10} {"pico (MB)":>10}')
+    for r in relatorio['resultados']:
+        pico = '-' if r['pico_memoria_mb'] is None else f'{r["pico_memoria_mb"]:.1f}'
+        print(f'{r["escala"]:>6} {r["linhas"]:>10} {r["etapa"]:<22} {r["p50_s"]:>10.4f} {r["p90_s"]:>10.4f} {r["p99_s"]:>10.4f} {pico:>10}')
+    print(f'Resultados gravados em {saida}')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            anterior = json.load(arquivo)
+        print(f'Mediana em relação a {anterior["commit"]} (acima de 1 é mais lento):')
+        for (escala, etapa), razao in comparar(relatorio, anterior).items():
+            print(f'  {escala:>4}x {etapa:<22} {razao:.2f}')
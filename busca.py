@@ -0,0 +1,166 @@
+import os
+import threading
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+import dados
+
+# Índice invertido salvo ao lado do snapshot dos dados
+ARQUIVO_INDICE = 'dados_discentes_comp_titulados_apenas.busca.npz'
+
+# Colunas textuais cobertas pela busca
+COLUNAS_BUSCA = ('NM_TESE_DISSERTACAO', 'NM_ORIENTADOR')
+
+# Colunas exibidas junto com os resultados da busca
+COLUNAS_RESULTADOS = ('AN_BASE', 'NM_REGIAO', 'NM_ENTIDADE_ENSINO', 'NM_TESE_DISSERTACAO', 'NM_ORIENTADOR')
+
+# Quantos trabalhos mais relevantes são listados abaixo do gráfico
+LIMITE_RESULTADOS = 50
+
+# Maior caractere possível nos termos, usado para achar o fim de um intervalo de prefixo
+_FIM_PREFIXO = '\x7f'
+
+
+def normalizar(texto):
+    """Remove acentos e passa para minúsculas, para que 'Computação' e 'computacao' sejam o mesmo termo."""
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii').lower()
+
+
+def tokenizar(texto):
+    """Termos de um texto já normalizado: sequências de letras e dígitos."""
+    return pd.Series([normalizar(texto)]).str.findall(r'[a-z0-9]+')[0]
+
+
+def ocorrencias_termos(df, colunas=COLUNAS_BUSCA, deslocamento=0):
+    """Frequência de cada termo por linha das colunas, numerando as linhas a partir do deslocamento."""
+    termos = []
+    for coluna in colunas:
+        textos = df[coluna].astype(str).where(df[coluna].notna(), '')
+        normalizados = textos.str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii').str.lower()
+        por_linha = normalizados.str.findall(r'[a-z0-9]+').reset_index(drop=True).explode().dropna()
+        termos.append(pd.DataFrame({'termo': por_linha.to_numpy(), 'linha': por_linha.index.to_numpy() + deslocamento}))
+
+    return pd.concat(termos).groupby(['termo', 'linha']).size().reset_index(name='frequencia')
+
+
+def _montar_indice(ocorrencias, n_linhas):
+    """Índice a partir das ocorrências já ordenadas por termo e linha."""
+    vocabulario, inicios = np.unique(ocorrencias['termo'].to_numpy(dtype=str), return_index=True)
+
+    return {
+        'n_linhas': np.int64(n_linhas),
+        'vocabulario': vocabulario,
+        'inicios': np.append(inicios, len(ocorrencias)).astype('int64'),
+        'linhas': ocorrencias['linha'].to_numpy(dtype='int32'),
+        'frequencias': ocorrencias['frequencia'].to_numpy(dtype='int32'),
+    }
+
+
+def construir_indice(df, colunas=COLUNAS_BUSCA):
+    """Índice invertido dos termos das colunas: para cada termo, as linhas onde aparece e quantas vezes."""
+    return _montar_indice(ocorrencias_termos(df, colunas), len(df))
+
+
+def estender_indice(indice, df_novos, colunas=COLUNAS_BUSCA):
+    """Acrescenta as linhas anexadas ao final dos dados, sem tokenizar de novo as que já estavam no índice."""
+    antigas = pd.DataFrame({
+        'termo': np.repeat(indice['vocabulario'], np.diff(indice['inicios'])),
+        'linha': indice['linhas'],
+        'frequencia': indice['frequencias'],
+    })
+    novas = ocorrencias_termos(df_novos, colunas, deslocamento=int(indice['n_linhas']))
+
+    ocorrencias = pd.concat([antigas, novas]).sort_values(['termo', 'linha'], kind='mergesort')
+    return _montar_indice(ocorrencias, int(indice['n_linhas']) + len(df_novos))
+
+
+def salvar_indice(indice, caminho=ARQUIVO_INDICE, versao=''):
+    """Grava o índice em um arquivo .npz, com a versão dos dados de que foi construído, trocando o antigo só no final."""
+    # Um temporário por processo e thread, pois vários processos podem construir o índice ao mesmo tempo
+    temporario = f'{caminho}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(temporario, 'wb') as arquivo:
+            np.savez(arquivo, versao=np.array(versao), **indice)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+def ler_indice(caminho=ARQUIVO_INDICE):
+    """Lê o índice gravado por salvar_indice, sem a versão."""
+    with np.load(caminho, allow_pickle=False) as arquivo:
+        indice = {nome: arquivo[nome] for nome in arquivo.files if nome != 'versao'}
+    indice['n_linhas'] = int(indice['n_linhas'])
+    return indice
+
+
+def indice_valido(caminho_indice=ARQUIVO_INDICE, assinatura=None):
+    """O índice vale se existir e tiver sido construído da versão dos dados indicada (dados.assinatura_dados).
+
+    A versão é a do conteúdo, então o índice continua valendo depois de uma cópia ou checkout que muda as datas.
+    """
+    if not os.path.exists(caminho_indice):
+        return False
+    with np.load(caminho_indice, allow_pickle=False) as arquivo:
+        return 'versao' in arquivo.files and str(arquivo['versao']) == assinatura
+
+
+def carregar_indice(caminho_indice=ARQUIVO_INDICE, caminho_csv=dados.ARQUIVO_DADOS, caminho_snapshot=dados.ARQUIVO_SNAPSHOT,
+                    assinatura=None):
+    """Lê o índice salvo, reconstruindo-o a partir dos dados se estiver ausente ou for de outra versão."""
+    if assinatura is None:
+        assinatura = dados.assinatura_dados(caminho_csv, caminho_snapshot)
+    if indice_valido(caminho_indice, assinatura):
+        return ler_indice(caminho_indice)
+
+    indice = construir_indice(dados.carregar(COLUNAS_BUSCA, caminho_csv, caminho_snapshot))
+    try:
+        salvar_indice(indice, caminho_indice, assinatura)
+    except OSError:
+        # Sem permissão de escrita: o índice fica só em memória
+        pass
+    return indice
+
+
+def _ocorrencias(indice, termo, prefixo):
+    """Linhas e frequências do termo, ou de todos os termos que começam com ele."""
+    vocabulario = indice['vocabulario']
+    inicio = np.searchsorted(vocabulario, termo, side='left')
+    if prefixo:
+        fim = np.searchsorted(vocabulario, termo + _FIM_PREFIXO, side='left')
+    else:
+        fim = inicio + int(inicio < len(vocabulario) and vocabulario[inicio] == termo)
+
+    trecho = slice(indice['inicios'][inicio], indice['inicios'][fim])
+    return indice['linhas'][trecho], indice['frequencias'][trecho]
+
+
+def buscar(indice, consulta):
+    """Posições das linhas com todos os termos da consulta, da mais para a menos relevante.
+
+    O último termo vale como prefixo, para que a busca funcione enquanto a palavra é digitada.
+    A relevância soma, para cada termo, a frequência na linha ponderada pela raridade do termo (tf-idf).
+    """
+    termos = tokenizar(consulta)
+    n_linhas = indice['n_linhas']
+    if not termos:
+        return np.array([], dtype='int64'), np.array([], dtype='float64')
+
+    pontuacoes = np.zeros(n_linhas, dtype='float64')
+    encontrados = np.zeros(n_linhas, dtype='int32')
+    for i, termo in enumerate(termos):
+        linhas, frequencias = _ocorrencias(indice, termo, prefixo=i == len(termos) - 1)
+        pontuacao_termo = np.bincount(linhas, weights=frequencias, minlength=n_linhas)
+        presentes = pontuacao_termo > 0
+
+        idf = np.log1p(n_linhas / max(presentes.sum(), 1))
+        pontuacoes += idf * pontuacao_termo
+        encontrados += presentes
+
+    posicoes = np.flatnonzero(encontrados == len(termos))
+    ordem = np.argsort(-pontuacoes[posicoes], kind='stable')
+    return posicoes[ordem], pontuacoes[posicoes[ordem]]
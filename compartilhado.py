@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+import pyarrow as pa
+
+import agregados
+import dados
+import filtros
+import metricas
+import orientadores
+
+# Cada versão dos dados é publicada em um subdiretório próprio, nomeado pela assinatura do conteúdo
+DIRETORIO_COMPARTILHADO = 'dados_discentes_comp_titulados_apenas.compartilhado'
+
+
+def nome_versao(assinatura):
+    """Nome do subdiretório da versão correspondente à assinatura dos dados."""
+    return hashlib.sha1(repr(assinatura).encode()).hexdigest()[:16]
+
+
+def gravar_tabela(df, caminho):
+    """Grava o DataFrame como arquivo Arrow sem compressão, que pode ser mapeado em memória sem cópia."""
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(caminho, 'wb') as arquivo:
+        with pa.ipc.new_file(arquivo, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+
+
+def mapear_tabela(caminho):
+    """Lê um arquivo Arrow mapeado em memória; as colunas numéricas e os códigos das categorias não são copiados."""
+    tabela = pa.ipc.open_file(pa.memory_map(caminho)).read_all()
+    return tabela.to_pandas(split_blocks=True)
+
+
+def gravar_bitmaps(indice, diretorio):
+    """Grava os bitmaps do índice de filtros como uma única matriz, com os rótulos das linhas em JSON."""
+    entradas = [
+        (coluna, valor.item() if isinstance(valor, np.generic) else valor)
+        for coluna, bitmaps in indice['bitmaps'].items()
+        for valor in bitmaps
+    ]
+    matriz = np.stack([indice['bitmaps'][coluna][valor] for coluna, valor in entradas])
+    np.save(os.path.join(diretorio, 'bitmaps.npy'), matriz)
+
+    with open(os.path.join(diretorio, 'bitmaps.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump({'n_linhas': indice['n_linhas'], 'entradas': entradas}, arquivo)
+
+
+def mapear_bitmaps(diretorio):
+    """Índice de filtros cujos bitmaps são linhas da matriz mapeada em memória."""
+    matriz = np.load(os.path.join(diretorio, 'bitmaps.npy'), mmap_mode='r')
+    with open(os.path.join(diretorio, 'bitmaps.json'), encoding='utf-8') as arquivo:
+        rotulos = json.load(arquivo)
+
+    indice = {'n_linhas': rotulos['n_linhas'], 'bitmaps': {}}
+    for linha, (coluna, valor) in enumerate(rotulos['entradas']):
+        indice['bitmaps'].setdefault(coluna, {})[valor] = matriz[linha]
+    return indice
+
+
+def gravar_tabelas(tabelas, diretorio, prefixo):
+    """Grava um dicionário de DataFrames, um arquivo Arrow por chave."""
+    for nome, df in tabelas.items():
+        gravar_tabela(df, os.path.join(diretorio, f'{prefixo}_{nome}.arrow'))
+
+
+def mapear_tabelas(diretorio, prefixo, nomes):
+    """Lê de volta, mapeados em memória, os DataFrames gravados por gravar_tabelas."""
+    return {nome: mapear_tabela(os.path.join(diretorio, f'{prefixo}_{nome}.arrow')) for nome in nomes}
+
+
+def gravar_objeto(objeto, caminho):
+    """Grava estruturas aninhadas e pequenas, como os resumos anuais das universidades, com pickle."""
+    with open(caminho, 'wb') as arquivo:
+        pickle.dump(objeto, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def ler_objeto(caminho):
+    """Lê um objeto gravado por gravar_objeto."""
+    with open(caminho, 'rb') as arquivo:
+        return pickle.load(arquivo)
+
+
+def gravar_indice_universidades(indice, diretorio):
+    """Grava as posições das universidades como vetores .npy e só os nomes e os resumos anuais com pickle."""
+    np.save(os.path.join(diretorio, 'universidades_posicoes.npy'), indice['posicoes'])
+    np.save(os.path.join(diretorio, 'universidades_inicios.npy'), indice['inicios'])
+    gravar_objeto({'nomes': indice['nomes'], 'resumos': indice['resumos']}, os.path.join(diretorio, 'universidades.pickle'))
+
+
+def mapear_indice_universidades(diretorio):
+    """Índice de universidades com as posições mapeadas em memória, sem uma cópia por processo."""
+    indice = ler_objeto(os.path.join(diretorio, 'universidades.pickle'))
+    indice['codigos'] = {universidade: codigo for codigo, universidade in enumerate(indice['nomes'])}
+    indice['posicoes'] = np.load(os.path.join(diretorio, 'universidades_posicoes.npy'), mmap_mode='r')
+    indice['inicios'] = np.load(os.path.join(diretorio, 'universidades_inicios.npy'), mmap_mode='r')
+    return indice
+
+
+# Vetores do índice de orientadores gravados como .npy; os nomes vão em JSON
+VETORES_ORIENTADORES = ('codigos', 'entidades', 'anos', 'egressos', 'inicios_linhas', 'linhas')
+
+
+def gravar_indice_orientadores(indice, diretorio):
+    """Grava os vetores do índice de orientadores como .npy e os nomes em JSON."""
+    for nome in VETORES_ORIENTADORES:
+        np.save(os.path.join(diretorio, f'orientadores_{nome}.npy'), indice[nome])
+    pares_orientadores, pares_entidades = indice['pares_instituicoes']
+    np.save(os.path.join(diretorio, 'orientadores_pares_orientadores.npy'), pares_orientadores)
+    np.save(os.path.join(diretorio, 'orientadores_pares_entidades.npy'), pares_entidades)
+
+    with open(os.path.join(diretorio, 'orientadores.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump({'nomes': indice['nomes'].tolist(), 'nomes_entidades': indice['nomes_entidades'].tolist()}, arquivo)
+
+
+def mapear_indice_orientadores(diretorio):
+    """Índice de orientadores com os vetores mapeados em memória; só os nomes são lidos para cada processo."""
+    def mapear(nome):
+        return np.load(os.path.join(diretorio, f'orientadores_{nome}.npy'), mmap_mode='r')
+
+    with open(os.path.join(diretorio, 'orientadores.json'), encoding='utf-8') as arquivo:
+        nomes = json.load(arquivo)
+
+    indice = {nome: mapear(nome) for nome in VETORES_ORIENTADORES}
+    indice['nomes'] = np.array(nomes['nomes'], dtype=object)
+    indice['codigo_nome'] = {nome: codigo for codigo, nome in enumerate(nomes['nomes'])}
+    indice['nomes_entidades'] = np.array(nomes['nomes_entidades'], dtype=object)
+    indice['pares_instituicoes'] = (mapear('pares_orientadores'), mapear('pares_entidades'))
+    return indice
+
+
+# Artefatos de cada versão: as colunas lidas do snapshot, como construí-lo a partir delas, como gravá-lo e como lê-lo
+ARTEFATOS = {
+    'dados': (
+        dados.COLUNAS_GRAFICOS,
+        lambda df: df,
+        lambda df, diretorio: gravar_tabela(df, os.path.join(diretorio, 'dados.arrow')),
+        lambda diretorio: mapear_tabela(os.path.join(diretorio, 'dados.arrow')),
+    ),
+    'cubos': (
+        dados.COLUNAS_GRAFICOS,
+        agregados.construir_cubos,
+        lambda cubos, diretorio: gravar_tabelas(cubos, diretorio, 'cubo'),
+        lambda diretorio: mapear_tabelas(diretorio, 'cubo', agregados.DIMENSOES),
+    ),
+    'indice_filtros': (
+        dados.COLUNAS_GRAFICOS,
+        filtros.construir_indice,
+        gravar_bitmaps,
+        mapear_bitmaps,
+    ),
+    'indice_universidades': (
+        dados.COLUNAS_GRAFICOS,
+        agregados.construir_indice_universidades,
+        gravar_indice_universidades,
+        mapear_indice_universidades,
+    ),
+    'histogramas': (
+        dados.COLUNAS_GRAFICOS,
+        agregados.construir_histogramas,
+        lambda histogramas, diretorio: gravar_tabelas(histogramas, diretorio, 'histograma'),
+        lambda diretorio: mapear_tabelas(diretorio, 'histograma', agregados.COLUNAS_DISTRIBUICAO),
+    ),
+    'indice_orientadores': (
+        orientadores.COLUNAS_ORIENTADORES,
+        orientadores.construir_indice,
+        gravar_indice_orientadores,
+        mapear_indice_orientadores,
+    ),
+}
+
+
+def construir_artefatos(caminho_csv=dados.ARQUIVO_DADOS, caminho_snapshot=dados.ARQUIVO_SNAPSHOT):
+    """Todos os artefatos montados em memória, sem passar pelo disco; cada conjunto de colunas é lido uma vez."""
+    quadros = {}
+    artefatos = {}
+    for nome, (colunas, construir, _, _) in ARTEFATOS.items():
+        if colunas not in quadros:
+            quadros[colunas] = dados.carregar(colunas, caminho_csv, caminho_snapshot)
+        artefatos[nome] = construir(quadros[colunas])
+    return artefatos
+
+
+def gravar_artefato(nome, diretorio, caminho_csv=dados.ARQUIVO_DADOS, caminho_snapshot=dados.ARQUIVO_SNAPSHOT):
+    """Lê as colunas do artefato, o constrói e o grava; pode rodar em outro processo."""
+    colunas, construir, gravar, _ = ARTEFATOS[nome]
+    gravar(construir(dados.carregar(colunas, caminho_csv, caminho_snapshot)), diretorio)
+    return nome
+
+
+def limpar_versoes(diretorio, versao_atual):
+    """Apaga as versões antigas; processos que ainda as mapeiam continuam lendo até soltá-las."""
+    for nome in os.listdir(diretorio):
+        if nome != versao_atual and not nome.startswith('.'):
+            shutil.rmtree(os.path.join(diretorio, nome), ignore_errors=True)
+
+
+def publicar(assinatura, diretorio=DIRETORIO_COMPARTILHADO, executor=None,
+             caminho_csv=dados.ARQUIVO_DADOS, caminho_snapshot=dados.ARQUIVO_SNAPSHOT, limpar=True):
+    """Publica os artefatos da versão, se nenhum processo já o fez, e retorna o diretório dela.
+
+    Tudo é escrito em um diretório temporário e renomeado no final; se outro processo publicar
+    a mesma versão antes, a publicação dele é aproveitada. Com um executor, cada artefato é
+    construído em paralelo por gravar_artefato. Os artefatos são construídos a partir dos arquivos indicados,
+    os mesmos que deram a assinatura. Sem limpar, as versões antigas ficam para quem ainda as usa.
+    """
+    versao = nome_versao(assinatura)
+    destino = os.path.join(diretorio, versao)
+    if os.path.isdir(destino):
+        return destino
+
+    os.makedirs(diretorio, exist_ok=True)
+    temporario = tempfile.mkdtemp(prefix='.publicando-', dir=diretorio)
+    try:
+        if executor is None:
+            for nome, artefato in construir_artefatos(caminho_csv, caminho_snapshot).items():
+                ARTEFATOS[nome][2](artefato, temporario)
+        else:
+            n = len(ARTEFATOS)
+            list(executor.map(gravar_artefato, ARTEFATOS, [temporario] * n, [caminho_csv] * n, [caminho_snapshot] * n))
+
+        # mkdtemp cria o diretório visível só para o dono; os outros processos também precisam lê-lo
+        os.chmod(temporario, 0o755)
+        os.rename(temporario, destino)
+    except OSError:
+        shutil.rmtree(temporario, ignore_errors=True)
+        if not os.path.isdir(destino):
+            raise
+
+    if limpar:
+        limpar_versoes(diretorio, versao)
+    return destino
+
+
+@metricas.medido
+def anexar(assinatura, diretorio=DIRETORIO_COMPARTILHADO, caminho_csv=dados.ARQUIVO_DADOS, caminho_snapshot=dados.ARQUIVO_SNAPSHOT):
+    """Artefatos da versão lidos dos arquivos publicados, com os dados e os bitmaps mapeados em memória.
+
+    Os processos da mesma máquina compartilham as páginas dos arquivos pelo cache do sistema operacional,
+    então mais processos não multiplicam a memória ocupada por essas estruturas.
+    """
+    try:
+        destino = publicar(assinatura, diretorio, None, caminho_csv, caminho_snapshot)
+    except OSError:
+        # Sem permissão de escrita: cada processo monta a sua própria cópia
+        return construir_artefatos(caminho_csv, caminho_snapshot)
+
+    return {nome: ler(destino) for nome, (_, _, _, ler) in ARTEFATOS.items()}
@@ -0,0 +1,411 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+ARQUIVO_DADOS = 'dados_discentes_comp_titulados_apenas.csv'
+ARQUIVO_SNAPSHOT = 'dados_discentes_comp_titulados_apenas.parquet'
+
+# Colunas textuais com poucos valores distintos, guardadas como categorias
+COLUNAS_CATEGORICAS = [
+    'NM_GRANDE_AREA_CONHECIMENTO', 'NM_AREA_AVALIACAO', 'SG_ENTIDADE_ENSINO',
+    'NM_ENTIDADE_ENSINO', 'CS_STATUS_JURIDICO', 'DS_DEPENDENCIA_ADMINISTRATIVA',
+    'NM_MODALIDADE_PROGRAMA', 'NM_GRAU_PROGRAMA', 'CD_PROGRAMA_IES',
+    'NM_PROGRAMA_IES', 'NM_REGIAO', 'SG_UF_PROGRAMA', 'NM_MUNICIPIO_PROGRAMA_IES',
+    'TP_DOCUMENTO_DISCENTE', 'NM_PAIS_NACIONALIDADE_DISCENTE',
+    'DS_TIPO_NACIONALIDADE_DISCENTE', 'DS_FAIXA_ETARIA',
+    'DS_GRAU_ACADEMICO_DISCENTE', 'ST_INGRESSANTE', 'NM_SITUACAO_DISCENTE',
+]
+
+# Colunas inteiras pequenas; lidas como float para tolerar valores ausentes
+COLUNAS_INTEIRAS = ['AN_BASE', 'IDADE_APROX_DISCENTE']
+
+COLUNAS_DATAS = ['DT_MATRICULA_DISCENTE', 'DT_SITUACAO_DISCENTE']
+
+# Formato das datas no CSV da CAPES, exportado pelo SAS, como em 01MAR2015:00:00:00
+FORMATO_DATAS = '%d%b%Y:%H:%M:%S'
+
+TIPOS_COLUNAS = {coluna: 'category' for coluna in COLUNAS_CATEGORICAS}
+TIPOS_COLUNAS.update({coluna: 'float32' for coluna in COLUNAS_INTEIRAS})
+
+# Todas as colunas exibidas na tabela de dados brutos, na ordem do CSV
+COLUNAS_BRUTAS = (
+    'AN_BASE', 'NM_GRANDE_AREA_CONHECIMENTO',
+    'CD_AREA_AVALIACAO', 'NM_AREA_AVALIACAO', 'CD_ENTIDADE_CAPES',
+    'CD_ENTIDADE_EMEC', 'SG_ENTIDADE_ENSINO', 'NM_ENTIDADE_ENSINO',
+    'CS_STATUS_JURIDICO', 'DS_DEPENDENCIA_ADMINISTRATIVA',
+    'NM_MODALIDADE_PROGRAMA', 'NM_GRAU_PROGRAMA', 'CD_PROGRAMA_IES',
+    'NM_PROGRAMA_IES', 'NM_REGIAO', 'SG_UF_PROGRAMA',
+    'NM_MUNICIPIO_PROGRAMA_IES', 'CD_CONCEITO_PROGRAMA',
+    'CD_CONCEITO_CURSO', 'ID_PESSOA', 'TP_DOCUMENTO_DISCENTE',
+    'NR_DOCUMENTO_DISCENTE', 'NM_DISCENTE',
+    'NM_PAIS_NACIONALIDADE_DISCENTE', 'DS_TIPO_NACIONALIDADE_DISCENTE',
+    'AN_NASCIMENTO_DISCENTE', 'DS_FAIXA_ETARIA',
+    'DS_GRAU_ACADEMICO_DISCENTE', 'ST_INGRESSANTE', 'NM_SITUACAO_DISCENTE',
+    'DT_MATRICULA_DISCENTE', 'DT_SITUACAO_DISCENTE', 'QT_MES_TITULACAO',
+    'NM_TESE_DISSERTACAO', 'NM_ORIENTADOR', 'ID_ADD_FOTO_PROGRAMA',
+    'ID_ADD_FOTO_PROGRAMA_IES', 'NM_ORIENTADOR_PRINCIPAL', 'PCPF', 'CHK',
+    'ANO_MATRICULA_DISCENTE', 'IDADE_APROX_DISCENTE',
+)
+
+# Colunas usadas pelos gráficos; textos longos e identificadores ficam de fora e só são lidos sob demanda
+COLUNAS_GRAFICOS = (
+    'AN_BASE', 'NM_REGIAO', 'DS_GRAU_ACADEMICO_DISCENTE', 'NM_ENTIDADE_ENSINO',
+    'DS_DEPENDENCIA_ADMINISTRATIVA', 'CS_STATUS_JURIDICO', 'CD_CONCEITO_PROGRAMA',
+    'DS_TIPO_NACIONALIDADE_DISCENTE', 'IDADE_APROX_DISCENTE', 'QT_MES_TITULACAO',
+)
+
+# Colunas que definem as partições do snapshot: cada (ano, região) vira um grupo de linhas no Parquet
+COLUNAS_PARTICAO = ('AN_BASE', 'NM_REGIAO')
+
+# Chave dos metadados do Parquet onde ficam os limites de cada partição
+CHAVE_PARTICOES = b'docencia.particoes'
+
+# Chave dos metadados do Parquet com a impressão digital do CSV de origem e se houve ingestão de novos anos
+CHAVE_ORIGEM = b'docencia.origem'
+
+# Versão da conversão das colunas; sobe quando ela muda, para que os snapshots gerados do CSV sejam refeitos
+VERSAO_FORMATO = 2
+
+# Impressões digitais já calculadas, por (caminho, mtime, tamanho); cada processo lê o CSV uma vez por versão
+_impressoes = {}
+
+# Metadados já lidos de cada snapshot, também por (caminho, mtime, tamanho), para não reler o rodapé a cada execução
+_metadados = {}
+
+
+def assinatura_arquivo(caminho=ARQUIVO_DADOS):
+    """Retorna (mtime, tamanho) do arquivo, usados como chave de cache."""
+    info = os.stat(caminho)
+    return info.st_mtime_ns, info.st_size
+
+
+def assinatura_dados(caminho_csv=ARQUIVO_DADOS, caminho_snapshot=ARQUIVO_SNAPSHOT):
+    """Versão dos dados pelo conteúdo, usada nas chaves de cache e no nome dos artefatos publicados.
+
+    Vem da origem gravada no snapshot, que é gerado antes se estiver ausente ou velho; não muda com touch,
+    checkout ou cópias que não preservam as datas dos arquivos. Sem snapshot (diretório sem escrita) vem
+    da impressão do CSV, a mesma que o snapshot gerado dele teria.
+    """
+    if not garantir_snapshot(caminho_csv, caminho_snapshot):
+        return versao_csv(impressao_csv(caminho_csv))
+
+    origem = ler_origem(caminho_snapshot)
+    if origem is None or 'versao' not in origem:
+        # Snapshot gravado antes da versão pelo conteúdo, sem CSV para refazê-lo: vale o arquivo
+        return '%d-%d' % assinatura_arquivo(caminho_snapshot)
+    return origem['versao']
+
+
+def impressao_csv(caminho=ARQUIVO_DADOS):
+    """Tamanho e SHA-1 do conteúdo do CSV; não mudam com touch, checkout ou rsync que preservam o conteúdo."""
+    chave = (caminho,) + assinatura_arquivo(caminho)
+    if chave not in _impressoes:
+        sha1 = hashlib.sha1()
+        with open(caminho, 'rb') as arquivo:
+            for bloco in iter(lambda: arquivo.read(1 << 20), b''):
+                sha1.update(bloco)
+        _impressoes[chave] = {'tamanho': chave[2], 'sha1': sha1.hexdigest()}
+    return _impressoes[chave]
+
+
+def versao_csv(impressao):
+    """Versão dos dados gerados do CSV: muda com o conteúdo dele ou com a conversão das colunas."""
+    texto = f"{impressao['sha1']}:{impressao['tamanho']}:{VERSAO_FORMATO}"
+    return hashlib.sha1(texto.encode()).hexdigest()[:16]
+
+
+def converter_datas(serie):
+    """Converte as datas no formato da CAPES; se algum valor não seguir o formato, a coluna fica como texto, sem perder nada."""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+
+    datas = pd.to_datetime(serie, format=FORMATO_DATAS, errors='coerce')
+    perdidas = int((datas.isna() & serie.notna()).sum())
+    if perdidas:
+        warnings.warn(f'{perdidas} valores de {serie.name} fora do formato {FORMATO_DATAS}; a coluna é mantida como texto')
+        return serie
+    return datas
+
+
+def ajustar_tipos(df):
+    """Reduz as colunas inteiras ao menor tipo que comporta seus valores e converte as datas para datetime."""
+    for coluna in COLUNAS_INTEIRAS:
+        if coluna in df.columns and not df[coluna].isna().any():
+            df[coluna] = df[coluna].astype('int16')
+
+    for coluna in df.select_dtypes(include='integer').columns:
+        df[coluna] = pd.to_numeric(df[coluna], downcast='integer')
+
+    for coluna in COLUNAS_DATAS:
+        if coluna in df.columns:
+            df[coluna] = converter_datas(df[coluna])
+
+    return df
+
+
+def ler_csv(caminho=ARQUIVO_DADOS, colunas=None):
+    """Lê o CSV da CAPES já com os tipos das colunas declarados."""
+    usecols = list(colunas) if colunas is not None else None
+    df = pd.read_csv(caminho, dtype=TIPOS_COLUNAS, usecols=usecols)
+    return ajustar_tipos(df)
+
+
+def ordenar_particoes(df):
+    """Ordena as linhas por ano e região, mantendo o índice original para quem precisa saber quem mudou de lugar."""
+    return df.sort_values(list(COLUNAS_PARTICAO), kind='mergesort')
+
+
+def limites_particoes(df):
+    """Trechos contínuos de linhas com o mesmo (ano, região), como dicionários com início e fim."""
+    if len(df) == 0:
+        return []
+
+    codigos = np.column_stack([pd.factorize(df[coluna])[0] for coluna in COLUNAS_PARTICAO])
+    inicios = np.concatenate([[0], np.flatnonzero((np.diff(codigos, axis=0) != 0).any(axis=1)) + 1])
+    fins = np.append(inicios[1:], len(df))
+
+    particoes = []
+    for inicio, fim in zip(inicios, fins):
+        ano, regiao = (df[coluna].iloc[inicio] for coluna in COLUNAS_PARTICAO)
+        particoes.append({
+            'ano': None if pd.isna(ano) else int(ano),
+            'regiao': None if pd.isna(regiao) else str(regiao),
+            'inicio': int(inicio),
+            'fim': int(fim),
+        })
+    return particoes
+
+
+def ler_metadados(caminho_snapshot=ARQUIVO_SNAPSHOT):
+    """Metadados do esquema do snapshot, lidos do rodapé uma vez por versão do arquivo."""
+    chave = (caminho_snapshot,) + assinatura_arquivo(caminho_snapshot)
+    if chave not in _metadados:
+        _metadados[chave] = pq.read_schema(caminho_snapshot).metadata or {}
+    return _metadados[chave]
+
+
+def ler_particoes(caminho_snapshot=ARQUIVO_SNAPSHOT):
+    """Limites das partições gravados no snapshot, ou None se ele foi gravado sem partições."""
+    metadados = ler_metadados(caminho_snapshot)
+    if CHAVE_PARTICOES not in metadados:
+        return None
+    return json.loads(metadados[CHAVE_PARTICOES])
+
+
+def ler_origem(caminho_snapshot=ARQUIVO_SNAPSHOT):
+    """Origem gravada no snapshot (impressão do CSV, versão dos dados e se houve ingestão), ou None em snapshots antigos."""
+    metadados = ler_metadados(caminho_snapshot)
+    if CHAVE_ORIGEM not in metadados:
+        return None
+    return json.loads(metadados[CHAVE_ORIGEM])
+
+
+def particao_selecionada(particao, anos=None, regioes=None):
+    """A partição entra na leitura se o ano e a região dela estiverem na seleção (None seleciona todos)."""
+    return (anos is None or particao['ano'] in anos) and (regioes is None or particao['regiao'] in regioes)
+
+
+def snapshot_valido(caminho_csv=ARQUIVO_DADOS, caminho_snapshot=ARQUIVO_SNAPSHOT):
+    """O snapshot vale se existir, for particionado e tiver sido gerado do conteúdo atual do CSV com a conversão atual (quando há CSV).
+
+    Depois de uma ingestão o snapshot é a fonte dos dados: os anos acrescentados só existem nele, então
+    ele nunca é recriado do CSV. Para recomeçar de um CSV novo, gere o snapshot com `python dados.py`.
+    """
+    if not os.path.exists(caminho_snapshot):
+        return False
+    if ler_particoes(caminho_snapshot) is None:
+        return False
+    if not os.path.exists(caminho_csv):
+        return True
+
+    origem = ler_origem(caminho_snapshot)
+    if origem is None:
+        # Snapshot gravado antes da impressão digital: vale a comparação das datas
+        return os.stat(caminho_snapshot).st_mtime_ns >= os.stat(caminho_csv).st_mtime_ns
+    if origem.get('ingerido'):
+        return True
+    if origem.get('formato') != VERSAO_FORMATO:
+        return False
+    impressao = impressao_csv(caminho_csv)
+    return origem['tamanho'] == impressao['tamanho'] and origem['sha1'] == impressao['sha1']
+
+
+def salvar_snapshot(df, caminho_snapshot=ARQUIVO_SNAPSHOT, origem=None):
+    """Grava o DataFrame em Parquet com um grupo de linhas por partição e as textuais codificadas por dicionário.
+
+    As linhas devem vir ordenadas por ordenar_particoes; fora de ordem, cada trecho vira uma partição separada.
+    A origem (impressão do CSV e se houve ingestão) vai para os metadados e decide a validade do snapshot.
+    """
+    particoes = limites_particoes(df)
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    metadados = dict(tabela.schema.metadata or {})
+    metadados[CHAVE_PARTICOES] = json.dumps(particoes).encode()
+    if origem is not None:
+        metadados[CHAVE_ORIGEM] = json.dumps(origem).encode()
+    esquema = tabela.schema.with_metadata(metadados)
+
+    # Escreve em um arquivo temporário e troca no final, para nunca expor um snapshot pela metade;
+    # cada processo e thread tem o seu, já que vários workers frios podem recriar o snapshot ao mesmo tempo
+    temporario = f'{caminho_snapshot}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        escritor = pq.ParquetWriter(temporario, esquema, use_dictionary=True)
+        try:
+            for particao in particoes:
+                trecho = tabela.slice(particao['inicio'], particao['fim'] - particao['inicio'])
+                escritor.write_table(trecho, row_group_size=trecho.num_rows)
+        finally:
+            escritor.close()
+        os.replace(temporario, caminho_snapshot)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+def garantir_snapshot(caminho_csv=ARQUIVO_DADOS, caminho_snapshot=ARQUIVO_SNAPSHOT):
+    """Gera o snapshot se estiver ausente ou velho e indica se há um snapshot válido para ler.
+
+    Sem permissão de escrita segue sem ele, e a leitura cai no CSV, como em carregar.
+    """
+    if snapshot_valido(caminho_csv, caminho_snapshot):
+        return True
+    try:
+        gerar_snapshot(caminho_csv, caminho_snapshot)
+    except OSError:
+        return False
+    return True
+
+
+def gerar_snapshot(caminho_csv=ARQUIVO_DADOS, caminho_snapshot=ARQUIVO_SNAPSHOT):
+    """Converte o CSV em Parquet, com as linhas ordenadas por partição."""
+    impressao = impressao_csv(caminho_csv)
+    origem = dict(impressao, formato=VERSAO_FORMATO, versao=versao_csv(impressao), ingerido=False)
+    df = ordenar_particoes(ler_csv(caminho_csv)).reset_index(drop=True)
+    salvar_snapshot(df, caminho_snapshot, origem)
+    return df
+
+
+def ler_snapshot(caminho_snapshot=ARQUIVO_SNAPSHOT, colunas=None, anos=None, regioes=None):
+    """Lê do snapshot só as colunas pedidas e os grupos de linhas das partições selecionadas.
+
+    Com seleção, o índice do DataFrame guarda a posição de cada linha nos dados completos.
+    """
+    if anos is None and regioes is None:
+        return pd.read_parquet(caminho_snapshot, engine='pyarrow', memory_map=True,
+                               columns=list(colunas) if colunas is not None else None)
+
+    todas = ler_particoes(caminho_snapshot)
+    grupos = [i for i, particao in enumerate(todas) if particao_selecionada(particao, anos, regioes)]
+    return ler_grupos(caminho_snapshot, grupos, colunas, todas)
+
+
+def ler_grupos(caminho_snapshot, grupos, colunas=None, particoes=None):
+    """Lê os grupos de linhas indicados, com o índice guardando a posição de cada linha nos dados completos."""
+    particoes = particoes if particoes is not None else ler_particoes(caminho_snapshot)
+    colunas = list(colunas) if colunas is not None else None
+
+    arquivo = pq.ParquetFile(caminho_snapshot, memory_map=True)
+    df = arquivo.read_row_groups(grupos, columns=colunas, use_pandas_metadata=True).to_pandas()
+    df.index = np.concatenate(
+        [np.arange(particoes[i]['inicio'], particoes[i]['fim']) for i in grupos] or [np.array([], dtype='int64')]
+    )
+    return df
+
+
+def carregar_linhas(posicoes, colunas, caminho_csv=ARQUIVO_DADOS, caminho_snapshot=ARQUIVO_SNAPSHOT):
+    """Lê apenas as linhas indicadas, na ordem pedida, decodificando só os grupos de linhas que as contêm."""
+    posicoes = np.asarray(posicoes, dtype='int64')
+    if not snapshot_valido(caminho_csv, caminho_snapshot):
+        return carregar(colunas, caminho_csv, caminho_snapshot).iloc[posicoes]
+
+    particoes = ler_particoes(caminho_snapshot)
+    inicios = np.array([particao['inicio'] for particao in particoes], dtype='int64')
+    grupos = np.unique(np.searchsorted(inicios, posicoes, side='right') - 1).tolist()
+
+    df = ler_grupos(caminho_snapshot, grupos, colunas, particoes)
+    return df.iloc[np.searchsorted(df.index.to_numpy(), posicoes)]
+
+
+def ler_lotes(posicoes, colunas, caminho_csv=ARQUIVO_DADOS, caminho_snapshot=ARQUIVO_SNAPSHOT):
+    """Linhas indicadas, em ordem crescente, com um grupo de linhas do snapshot decodificado de cada vez.
+
+    A memória ocupada depende do tamanho da maior partição, não da seleção. Há sempre pelo menos um lote,
+    vazio quando nenhuma linha é indicada, para que quem escreve conheça os tipos das colunas.
+    """
+    posicoes = np.asarray(posicoes, dtype='int64')
+    if not snapshot_valido(caminho_csv, caminho_snapshot):
+        yield carregar(colunas, caminho_csv, caminho_snapshot).iloc[posicoes]
+        return
+
+    particoes = ler_particoes(caminho_snapshot)
+    if len(posicoes) == 0:
+        yield ler_grupos(caminho_snapshot, [0] if particoes else [], colunas, particoes).iloc[:0]
+        return
+
+    # Posições ordenadas: as de um mesmo grupo de linhas formam um trecho contínuo
+    inicios = np.array([particao['inicio'] for particao in particoes], dtype='int64')
+    grupos = np.searchsorted(inicios, posicoes, side='right') - 1
+    cortes = np.flatnonzero(np.diff(grupos)) + 1
+    for trecho, grupo in zip(np.split(posicoes, cortes), grupos[np.append(0, cortes)]):
+        df = ler_grupos(caminho_snapshot, [int(grupo)], colunas, particoes)
+        yield df.iloc[trecho - particoes[grupo]['inicio']]
+
+
+def carregar(colunas=None, caminho_csv=ARQUIVO_DADOS, caminho_snapshot=ARQUIVO_SNAPSHOT, anos=None, regioes=None):
+    """Lê as colunas e partições pedidas do snapshot, recriando-o a partir do CSV se estiver ausente ou velho.
+
+    Anos e regiões restringem a leitura às partições selecionadas; o índice do resultado
+    guarda então a posição de cada linha nos dados completos.
+    """
+    if snapshot_valido(caminho_csv, caminho_snapshot):
+        return ler_snapshot(caminho_snapshot, colunas, anos, regioes)
+
+    try:
+        df = gerar_snapshot(caminho_csv, caminho_snapshot)
+    except OSError:
+        # Sem permissão de escrita: segue lendo direto do CSV, na mesma ordem do snapshot
+        leitura = None if colunas is None else list(dict.fromkeys(list(colunas) + list(COLUNAS_PARTICAO)))
+        df = ordenar_particoes(ler_csv(caminho_csv, leitura)).reset_index(drop=True)
+
+    if anos is not None or regioes is not None:
+        selecionadas = np.ones(len(df), dtype=bool)
+        if anos is not None:
+            selecionadas &= df['AN_BASE'].isin(anos).to_numpy()
+        if regioes is not None:
+            selecionadas &= df['NM_REGIAO'].isin(regioes).to_numpy()
+        df = df[selecionadas]
+
+    return df[list(colunas)] if colunas is not None else df
+
+
+def relatorio_memoria(caminho_csv=ARQUIVO_DADOS, caminho_snapshot=ARQUIVO_SNAPSHOT):
+    """Memória por coluna, em MB, do CSV lido sem tipos (antes) e do quadro compacto dos gráficos (depois)."""
+    antes = pd.read_csv(caminho_csv).memory_usage(deep=True, index=False)
+    depois = carregar(COLUNAS_GRAFICOS, caminho_csv, caminho_snapshot).memory_usage(deep=True, index=False)
+
+    relatorio = pd.concat({'antes_mb': antes, 'depois_mb': depois}, axis=1).fillna(0) / 2 ** 20
+    relatorio.loc['TOTAL'] = relatorio.sum()
+    return relatorio.round(3)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera o snapshot Parquet a partir do CSV de egressos da CAPES.')
+    parser.add_argument('--csv', default=ARQUIVO_DADOS, help='CSV de origem')
+    parser.add_argument('--saida', default=ARQUIVO_SNAPSHOT, help='arquivo Parquet de destino')
+    parser.add_argument('--memoria', action='store_true',
+                        help='mostra a memória por coluna antes e depois da compactação, em vez de gerar o snapshot')
+    args = parser.parse_args()
+
+    if args.memoria:
+        print(relatorio_memoria(args.csv, args.saida).to_string())
+    else:
+        df = gerar_snapshot(args.csv, args.saida)
+        print(f'{len(df)} linhas e {len(df.columns)} colunas gravadas em {args.saida}')
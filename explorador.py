@@ -0,0 +1,22 @@
+import dados
+
+# Opções de linhas por página oferecidas no explorador de dados brutos
+TAMANHOS_PAGINA = (50, 100, 500, 1000)
+
+
+def numero_paginas(total_linhas, tamanho_pagina):
+    """Quantidade de páginas necessárias para exibir as linhas, sempre pelo menos uma."""
+    return max(1, -(-total_linhas // tamanho_pagina))
+
+
+def ordenar(df, posicoes, coluna, crescente=True):
+    """Posições reordenadas pelos valores da coluna, com os valores ausentes sempre no final."""
+    valores = df[coluna].iloc[posicoes].reset_index(drop=True)
+    ordem = valores.sort_values(ascending=crescente, kind='mergesort', na_position='last').index.to_numpy()
+    return posicoes[ordem]
+
+
+def pagina(posicoes, numero, tamanho_pagina, colunas):
+    """Lê do snapshot apenas as linhas e colunas de uma página (numerada a partir de 1)."""
+    inicio = (numero - 1) * tamanho_pagina
+    return dados.carregar_linhas(posicoes[inicio:inicio + tamanho_pagina], colunas)
@@ -0,0 +1,152 @@
+import gzip
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import filtros
+import metricas
+
+# Arquivos exportados ficam em disco, um por seleção, para que downloads repetidos não refaçam o trabalho
+DIRETORIO_EXPORTACOES = os.path.join(tempfile.gettempdir(), 'docencia_exportacoes')
+
+# Quantas linhas são convertidas em texto de cada vez
+TAMANHO_LOTE = 50_000
+
+# Quantos arquivos exportados são mantidos antes de apagar os usados há mais tempo
+LIMITE_ARQUIVOS = 32
+
+
+def lotes_memoria(df, posicoes, colunas=None, tamanho_lote=TAMANHO_LOTE):
+    """Lotes das linhas selecionadas de um DataFrame já em memória; dados.ler_lotes faz o mesmo lendo do snapshot."""
+    colunas = list(colunas) if colunas is not None else list(df.columns)
+
+    # Pelo menos um lote, para que uma seleção vazia ainda gere o cabeçalho
+    for inicio in range(0, max(len(posicoes), 1), tamanho_lote):
+        yield filtros.linhas(df, posicoes[inicio:inicio + tamanho_lote], colunas)
+
+
+def escrever_csv(lotes, destino):
+    """Escreve os lotes como CSV em um arquivo binário já aberto, convertendo um lote por vez."""
+    texto = io.TextIOWrapper(destino, encoding='utf-8', newline='')
+
+    # O cabeçalho vai com o primeiro lote, que existe mesmo para uma seleção vazia
+    for i, lote in enumerate(lotes):
+        lote.to_csv(texto, header=i == 0, index=False)
+
+    # Solta o arquivo sem fechá-lo, quem abriu é quem fecha
+    texto.flush()
+    texto.detach()
+
+
+def escrever_csv_gzip(lotes, destino):
+    """Escreve o CSV compactando cada lote à medida que ele é gerado."""
+    with gzip.GzipFile(fileobj=destino, mode='wb') as compactado:
+        escrever_csv(lotes, compactado)
+
+
+def esquema_parquet(df):
+    """Esquema Arrow do lote, com as de texto sem valores conhecidos declaradas como string.
+
+    As categorias ficam com índices de 32 bits: cada lote traz as suas, e o pandas escolhe a largura
+    dos códigos pela quantidade delas.
+    """
+    esquema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    for i, campo in enumerate(esquema):
+        if pa.types.is_null(campo.type):
+            esquema = esquema.set(i, campo.with_type(pa.string()))
+        elif pa.types.is_dictionary(campo.type):
+            esquema = esquema.set(i, campo.with_type(pa.dictionary(pa.int32(), campo.type.value_type)))
+    return esquema
+
+
+def escrever_parquet(lotes, destino):
+    """Escreve os lotes como Parquet, um grupo de linhas por lote."""
+    escritor = None
+    try:
+        for lote in lotes:
+            # O esquema é fixado no primeiro lote, para que um lote com uma coluna toda vazia não mude o tipo dela
+            if escritor is None:
+                esquema = esquema_parquet(lote)
+                escritor = pq.ParquetWriter(destino, esquema, use_dictionary=True)
+            if len(lote):
+                escritor.write_table(pa.Table.from_pandas(lote, schema=esquema, preserve_index=False))
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+# Formatos oferecidos no download: extensão, tipo MIME e função que escreve o arquivo
+FORMATOS = {
+    'CSV': ('csv', 'text/csv', escrever_csv),
+    'CSV compactado (gzip)': ('csv.gz', 'application/gzip', escrever_csv_gzip),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet', escrever_parquet),
+}
+
+
+def caminho_exportacao(chave, extensao):
+    """Caminho do arquivo exportado identificado pela chave."""
+    nome = hashlib.sha1(repr(chave).encode()).hexdigest()
+    return os.path.join(DIRETORIO_EXPORTACOES, f'{nome}.{extensao}')
+
+
+def limpar_exportacoes(limite=LIMITE_ARQUIVOS):
+    """Apaga os arquivos exportados usados há mais tempo, mantendo no máximo `limite` deles."""
+    arquivos = [
+        os.path.join(DIRETORIO_EXPORTACOES, nome)
+        for nome in os.listdir(DIRETORIO_EXPORTACOES)
+        if not nome.endswith('.tmp')
+    ]
+    arquivos.sort(key=lambda caminho: os.stat(caminho).st_mtime_ns, reverse=True)
+
+    for caminho in arquivos[limite:]:
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+@metricas.medido
+def exportar(chave, extensao, escrever):
+    """Retorna o caminho do arquivo da chave, chamando escrever(arquivo) só quando ele ainda não existe.
+
+    A chave deve reunir tudo que muda o conteúdo: a assinatura dos dados, os filtros ativos e o formato.
+    """
+    caminho = caminho_exportacao(chave, extensao)
+
+    if os.path.exists(caminho):
+        # Marca como usado agora, para ficar entre os últimos a serem apagados
+        os.utime(caminho)
+        return caminho
+
+    os.makedirs(DIRETORIO_EXPORTACOES, exist_ok=True)
+
+    # Cada sessão escreve no seu temporário e troca no final, como no snapshot dos dados
+    temporario = f'{caminho}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(temporario, 'wb') as arquivo:
+            escrever(arquivo)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+    limpar_exportacoes()
+    return caminho
+
+
+def abrir(chave, extensao, escrever):
+    """Abre para leitura o arquivo da chave, gerando-o se preciso.
+
+    Outra sessão pode apagá-lo em limpar_exportacoes entre exportar e a abertura; nesse caso ele é gerado de novo.
+    Depois de aberto, o arquivo pode ser apagado sem afetar a leitura.
+    """
+    try:
+        return open(exportar(chave, extensao, escrever), 'rb')
+    except FileNotFoundError:
+        return open(exportar(chave, extensao, escrever), 'rb')
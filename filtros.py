@@ -0,0 +1,73 @@
+import numpy as np
+
+import metricas
+
+# Colunas com um bitmap por valor; novas dimensões de filtro entram nesta lista
+DIMENSOES_FILTRO = [
+    'NM_REGIAO', 'DS_GRAU_ACADEMICO_DISCENTE', 'NM_ENTIDADE_ENSINO',
+    'CD_CONCEITO_PROGRAMA', 'DS_TIPO_NACIONALIDADE_DISCENTE',
+]
+
+
+def bitmaps_coluna(serie):
+    """Cria um bitmap compactado (np.packbits) com as linhas de cada valor da coluna."""
+    n_linhas = len(serie)
+    bitmaps = {}
+    for valor, posicoes in serie.groupby(serie, observed=True, sort=False).indices.items():
+        linhas = np.zeros(n_linhas, dtype=bool)
+        linhas[posicoes] = True
+        bitmaps[valor] = np.packbits(linhas)
+    return bitmaps
+
+
+def construir_indice(df, colunas=DIMENSOES_FILTRO):
+    """Índice de filtros: um dicionário de bitmaps por coluna, construído uma vez por dataset."""
+    indice = {'n_linhas': len(df), 'bitmaps': {}}
+    for coluna in colunas:
+        adicionar_dimensao(indice, df[coluna])
+    return indice
+
+
+def adicionar_dimensao(indice, serie):
+    """Acrescenta uma coluna ao índice sem reprocessar as dimensões já indexadas."""
+    indice['bitmaps'][serie.name] = bitmaps_coluna(serie)
+
+
+def mascara(indice, selecoes):
+    """Combina as seleções: OU entre os valores de uma coluna, E entre colunas."""
+    n_bytes = (indice['n_linhas'] + 7) // 8
+    resultado = np.full(n_bytes, 0xFF, dtype=np.uint8)
+
+    for coluna, valores in selecoes.items():
+        bitmaps = indice['bitmaps'][coluna]
+        selecionadas = np.zeros(n_bytes, dtype=np.uint8)
+        for valor in valores:
+            if valor in bitmaps:
+                selecionadas |= bitmaps[valor]
+        resultado &= selecionadas
+
+    return resultado
+
+
+@metricas.medido
+def linhas_selecionadas(indice, selecoes):
+    """Vetor booleano com uma posição por linha, verdadeiro nas linhas selecionadas."""
+    return np.unpackbits(mascara(indice, selecoes), count=indice['n_linhas']).astype(bool)
+
+
+def selecionar(indice, selecoes):
+    """Retorna as posições das linhas que atendem às seleções, sem copiar o DataFrame."""
+    return np.flatnonzero(linhas_selecionadas(indice, selecoes))
+
+
+def linhas(df, posicoes, colunas):
+    """Materializa apenas as colunas pedidas das linhas selecionadas."""
+    return df.iloc[posicoes, df.columns.get_indexer(colunas)]
+
+
+def posicoes_locais(df, posicoes):
+    """Converte posições nos dados completos em posições de um DataFrame lido só de algumas partições.
+
+    O índice do DataFrame deve guardar as posições originais, como em dados.carregar com seleção.
+    """
+    return np.searchsorted(df.index.to_numpy(), posicoes)
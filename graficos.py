@@ -0,0 +1,161 @@
+import io
+import threading
+from collections import OrderedDict
+
+import seaborn as sns
+from matplotlib.figure import Figure
+
+import metricas
+
+# Limite de memória do cache de imagens renderizadas, compartilhado por todas as sessões
+LIMITE_CACHE_BYTES = 64 * 1024 * 1024
+
+# Tamanho padrão das figuras do dashboard
+TAMANHO_FIGURA = (15, 8)
+
+# Cor das caixas dos boxplots
+COR_BOXPLOT = "#2a9d8f"
+
+# Nome de cada dimensão no título dos gráficos de barras empilhadas
+ROTULOS_DIMENSOES = {
+    'NM_REGIAO': 'região',
+    'DS_DEPENDENCIA_ADMINISTRATIVA': 'dependência administrativa',
+    'CS_STATUS_JURIDICO': 'status jurídico',
+    'CD_CONCEITO_PROGRAMA': 'nota CAPES do programa',
+    'DS_TIPO_NACIONALIDADE_DISCENTE': 'nacionalidade',
+}
+
+_cache_imagens = OrderedDict()
+_bytes_em_cache = 0
+_trava_cache = threading.Lock()
+
+# Definindo o tema uma única vez por processo
+sns.set_theme(style="whitegrid")
+
+
+def nova_figura():
+    """Cria uma figura fora do pyplot: não entra no estado global e pode ser usada por várias sessões ao mesmo tempo."""
+    figura = Figure(figsize=TAMANHO_FIGURA)
+    return figura, figura.subplots()
+
+
+@metricas.medido
+def figura_para_png(figura):
+    """Serializa a figura em PNG e descarta seus elementos gráficos."""
+    buffer = io.BytesIO()
+    figura.savefig(buffer, format='png', bbox_inches='tight')
+    figura.clear()
+    return buffer.getvalue()
+
+
+@metricas.medido
+def barras_empilhadas(tabelas, dimensao, modo):
+    """Gráfico de barras empilhadas por ano de uma dimensão, em 'Valores absolutos' ou 'Porcentagem'.
+
+    tabelas é o par (absoluta, percentual) devolvido por agregados.tabela_dimensao.
+    """
+    pivot_df, pivot_df_percentage = tabelas
+    figura, ax = nova_figura()
+
+    # Gráfico de barras empilhadas com porcentagens ou com valores absolutos
+    tabela = pivot_df_percentage if modo == 'Porcentagem' else pivot_df
+
+    # Seleção vazia: só os eixos e o título, como no boxplot, pois o pandas não desenha uma tabela sem colunas
+    if not tabela.empty:
+        tabela.plot(kind='bar', stacked=True, edgecolor="0.2", ax=ax)
+        ax.legend(loc='lower right', prop={'size': 10})
+
+    ax.set_xlabel('Ano')
+    ax.set_ylabel('Porcentagem' if modo == 'Porcentagem' else 'Contagem')
+    ax.set_title('Gráfico de barras empilhadas de contagem de egressos por ano e ' + ROTULOS_DIMENSOES.get(dimensao, dimensao), fontsize=14)
+    return figura
+
+
+@metricas.medido
+def boxplot(estatisticas, mostrar_outliers, titulo, ylabel, limite_inferior=None):
+    """Desenha boxplots por ano a partir de estatísticas já calculadas (agregados.estatisticas_boxplot).
+
+    mostrar_outliers só muda o desenho; as estatísticas não são recalculadas.
+    """
+    figura, ax = nova_figura()
+
+    if estatisticas:
+        ax.bxp(
+            estatisticas, showfliers=mostrar_outliers, patch_artist=True,
+            boxprops={'facecolor': COR_BOXPLOT, 'edgecolor': '0.25'},
+            medianprops={'color': '0.25'}, whiskerprops={'color': '0.25'}, capprops={'color': '0.25'},
+            flierprops={'marker': 'd', 'markersize': 5, 'markerfacecolor': '0.25', 'markeredgecolor': '0.25'},
+        )
+
+    ax.set(xlabel='Ano', ylabel=ylabel)
+    if limite_inferior is not None:
+        ax.set_ylim(bottom=limite_inferior)
+    ax.set_title(titulo, fontsize=14)
+    return figura
+
+
+@metricas.medido
+def linhas(contagens, titulo, cor=None):
+    """Gráfico de linhas da contagem de egressos por ano, com uma linha por valor da coluna cor, se houver."""
+    figura, ax = nova_figura()
+    ordem = sorted(contagens[cor].unique()) if cor else None
+    line_plot = sns.lineplot(x='AN_BASE', y='counts', hue=cor, hue_order=ordem, data=contagens, linewidth=2.5, ax=ax)
+    line_plot.set(xlabel='Ano', ylabel='Contagem')
+    line_plot.set_ylim(bottom=0)  # Define o limite inferior do eixo y como 0
+    ax.set_title(titulo, fontsize=14)
+    return figura
+
+
+def chamas(execucao):
+    """Gráfico de chamas de uma execução medida por metricas: cada barra é um trecho, abaixo do trecho que o contém.
+
+    A cor vem da seção de primeiro nível, para ver de longe qual seção ocupou a execução.
+    """
+    figura, ax = nova_figura()
+    paleta = sns.color_palette(n_colors=10)
+    cores = {}
+
+    for caminho, inicio, duracao in execucao['quadros']:
+        partes = caminho.split(';')
+        cor = paleta[cores.setdefault(partes[0], len(cores)) % len(paleta)]
+        ax.barh(len(partes) - 1, duracao, left=inicio, height=0.9, color=cor, edgecolor='white')
+
+        # Só escreve o nome nas barras largas o bastante para ele caber
+        if duracao >= len(partes[-1]) * execucao['total'] / 200:
+            ax.text(inicio + duracao / 2, len(partes) - 1, partes[-1], ha='center', va='center', fontsize=8, clip_on=True)
+
+    ax.yaxis.get_major_locator().set_params(integer=True)
+    ax.invert_yaxis()
+    ax.set_xlim(0, execucao['total'])
+    ax.set(xlabel='Segundos desde o início da execução', ylabel='Nível')
+    ax.set_title(f"Execução de {execucao['data']:%H:%M:%S} ({execucao['total']:.2f}s)", fontsize=14)
+    return figura
+
+
+def renderizar(chave, desenhar):
+    """Retorna o PNG do gráfico identificado pela chave, chamando desenhar() só quando não está em cache.
+
+    A chave deve reunir tudo que muda o gráfico: a especificação, os filtros ativos e os botões de escolha.
+    """
+    global _bytes_em_cache
+
+    with _trava_cache:
+        if chave in _cache_imagens:
+            _cache_imagens.move_to_end(chave)
+            return _cache_imagens[chave]
+
+    # Só os gráficos desenhados nesta execução aparecem na medição, com o nome da chave
+    with metricas.medir(chave[0]):
+        imagem = desenhar()
+
+    with _trava_cache:
+        if chave not in _cache_imagens:
+            _cache_imagens[chave] = imagem
+            _bytes_em_cache += len(imagem)
+
+        # Descarta as imagens usadas há mais tempo até voltar ao limite de memória
+        while _bytes_em_cache > LIMITE_CACHE_BYTES and len(_cache_imagens) > 1:
+            _, descartada = _cache_imagens.popitem(last=False)
+            _bytes_em_cache -= len(descartada)
+
+    return imagem
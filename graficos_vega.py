@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+import metricas
+from graficos import COR_BOXPLOT, ROTULOS_DIMENSOES
+
+# Opções dos botões desenhados dentro dos gráficos, as mesmas dos botões de rádio do painel
+MODOS = ['Valores absolutos', 'Porcentagem']
+OPCOES_OUTLIERS = ['Sim', 'Não']
+
+# Cor das linhas dos boxplots, a mesma das imagens do matplotlib
+COR_LINHAS = '#404040'
+
+
+def _camada_botao(nome, campo, opcoes, inicial, rotulo):
+    """Camada invisível com uma seleção ligada a um botão de rádio no navegador; trocar de opção não volta ao servidor.
+
+    A seleção fica numa camada própria, com um único ponto sem posição, porque não pode filtrar a camada
+    em que é definida e cliques nas marcas também mudariam o seu valor.
+    """
+    return {
+        'data': {'values': [{campo: inicial}]},
+        'selection': {nome: {
+            'type': 'single', 'fields': [campo], 'init': {campo: inicial}, 'clear': False,
+            'bind': {'input': 'radio', 'options': opcoes, 'name': rotulo},
+        }},
+        'mark': {'type': 'point', 'opacity': 0},
+    }
+
+
+@metricas.medido
+def barras_empilhadas(tabelas, dimensao, modo):
+    """Especificação Vega-Lite das barras empilhadas por ano, com as tabelas absoluta e percentual.
+
+    As duas tabelas vão para o navegador, que alterna entre elas; modo é só a opção inicial.
+    """
+    pivot_df, pivot_df_percentage = tabelas
+    rotulo = ROTULOS_DIMENSOES.get(dimensao, dimensao)
+
+    # Formato longo: uma linha por (modo, ano, categoria)
+    valores = pd.concat({'Valores absolutos': pivot_df.stack(), 'Porcentagem': pivot_df_percentage.stack()}, names=['modo'])
+    valores = valores.rename('valor').reset_index().rename(columns={'AN_BASE': 'ano', dimensao: 'categoria'})
+    valores['ano'] = valores['ano'].astype(int)
+    valores['categoria'] = valores['categoria'].astype(str)
+
+    return {
+        'title': 'Contagem de egressos por ano e ' + rotulo,
+        'datasets': {'barras': valores},
+        'layer': [
+            _camada_botao('modo', 'modo', MODOS, modo, 'Tipo de gráfico: '),
+            {
+                'data': {'name': 'barras'},
+                'transform': [{'filter': {'selection': 'modo'}}],
+                'mark': {'type': 'bar', 'stroke': COR_LINHAS, 'strokeWidth': 0.5},
+                'encoding': {
+                    'x': {'field': 'ano', 'type': 'ordinal', 'title': 'Ano'},
+                    'y': {'field': 'valor', 'type': 'quantitative', 'stack': 'zero', 'title': 'Contagem ou porcentagem'},
+                    'color': {'field': 'categoria', 'type': 'nominal', 'title': rotulo.capitalize()},
+                    'tooltip': [
+                        {'field': 'ano', 'title': 'Ano'},
+                        {'field': 'categoria', 'title': rotulo.capitalize()},
+                        {'field': 'valor', 'type': 'quantitative', 'title': 'Valor', 'format': ',.1f'},
+                    ],
+                },
+            },
+        ],
+    }
+
+
+@metricas.medido
+def boxplot(estatisticas, mostrar_outliers, titulo, ylabel, limite_inferior=None):
+    """Especificação Vega-Lite dos boxplots por ano a partir das estatísticas já calculadas (agregados.estatisticas_boxplot).
+
+    Os outliers vão sempre para o navegador; mostrar_outliers só escolhe se começam visíveis.
+    """
+    caixas = pd.DataFrame({
+        'ano': [int(e['label']) for e in estatisticas],
+        'q1': [float(e['q1']) for e in estatisticas],
+        'mediana': [float(e['med']) for e in estatisticas],
+        'q3': [float(e['q3']) for e in estatisticas],
+        'minimo': [float(e['whislo']) for e in estatisticas],
+        'maximo': [float(e['whishi']) for e in estatisticas],
+    })
+    fliers = [np.asarray(e['fliers'], dtype='float64') for e in estatisticas]
+    outliers = pd.DataFrame({
+        'ano': np.repeat(caixas['ano'].to_numpy(), [len(f) for f in fliers]),
+        'valor': np.concatenate(fliers) if fliers else np.empty(0),
+        'outlier': 'Sim',
+    })
+
+    escala = {'zero': False} if limite_inferior is None else {'domainMin': limite_inferior}
+    eixo_y = {'type': 'quantitative', 'title': ylabel, 'scale': escala}
+    x = {'field': 'ano', 'type': 'ordinal', 'title': 'Ano'}
+
+    return {
+        'title': titulo,
+        'datasets': {'caixas': caixas, 'outliers': outliers},
+        'layer': [
+            {'data': {'name': 'caixas'}, 'mark': {'type': 'rule', 'color': COR_LINHAS},
+             'encoding': {'x': x, 'y': dict(eixo_y, field='minimo'), 'y2': {'field': 'maximo'}}},
+            {'data': {'name': 'caixas'}, 'mark': {'type': 'bar', 'size': 28, 'color': COR_BOXPLOT, 'stroke': COR_LINHAS},
+             'encoding': {
+                 'x': x, 'y': dict(eixo_y, field='q1'), 'y2': {'field': 'q3'},
+                 'tooltip': [
+                     {'field': 'ano', 'title': 'Ano'}, {'field': 'minimo', 'title': 'Mínimo'},
+                     {'field': 'q1', 'title': '1º quartil'}, {'field': 'mediana', 'title': 'Mediana'},
+                     {'field': 'q3', 'title': '3º quartil'}, {'field': 'maximo', 'title': 'Máximo'},
+                 ],
+             }},
+            {'data': {'name': 'caixas'}, 'mark': {'type': 'tick', 'size': 28, 'color': COR_LINHAS},
+             'encoding': {'x': x, 'y': dict(eixo_y, field='mediana')}},
+            _camada_botao('outliers', 'outlier', OPCOES_OUTLIERS, 'Sim' if mostrar_outliers else 'Não', 'Exibir outliers: '),
+            {'data': {'name': 'outliers'}, 'transform': [{'filter': {'selection': 'outliers'}}],
+             'mark': {'type': 'point', 'shape': 'diamond', 'filled': True, 'color': COR_LINHAS},
+             'encoding': {'x': x, 'y': dict(eixo_y, field='valor'), 'tooltip': [{'field': 'ano', 'title': 'Ano'}, {'field': 'valor', 'title': ylabel}]}},
+        ],
+    }
+
+
+@metricas.medido
+def linhas(contagens, titulo, cor=None):
+    """Especificação Vega-Lite da contagem de egressos por ano, com uma linha por valor da coluna cor, se houver."""
+    colunas = ['AN_BASE', 'counts'] + ([cor] if cor else [])
+    valores = contagens[colunas].rename(columns={'AN_BASE': 'ano', 'counts': 'contagem'})
+    valores['ano'] = valores['ano'].astype(int)
+
+    codificacao = {
+        'x': {'field': 'ano', 'type': 'ordinal', 'title': 'Ano'},
+        'y': {'field': 'contagem', 'type': 'quantitative', 'title': 'Contagem', 'scale': {'zero': True}},
+        'tooltip': [{'field': 'ano', 'title': 'Ano'}, {'field': 'contagem', 'title': 'Contagem'}],
+    }
+    if cor:
+        valores[cor] = valores[cor].astype(str)
+        codificacao['color'] = {'field': cor, 'type': 'nominal', 'title': ROTULOS_DIMENSOES.get(cor, cor).capitalize()}
+        codificacao['tooltip'].append({'field': cor, 'title': ROTULOS_DIMENSOES.get(cor, cor).capitalize()})
+
+    return {
+        'title': titulo,
+        'datasets': {'linhas': valores},
+        'data': {'name': 'linhas'},
+        'mark': {'type': 'line', 'point': True, 'strokeWidth': 2.5},
+        'encoding': codificacao,
+    }
@@ -0,0 +1,111 @@
+import argparse
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import busca
+import compartilhado
+import dados
+
+# Um egresso é identificado pela pessoa, pelo programa e pelo ano base
+CHAVES_EGRESSO = ['ID_PESSOA', 'CD_PROGRAMA_IES', 'AN_BASE']
+
+
+def unir(atual, novos):
+    """Anexa as linhas novas ao final dos dados, descartando as antigas que elas substituem.
+
+    Retorna os dados unidos, as linhas novas sem duplicatas e se alguma linha antiga foi descartada.
+    """
+    novos = novos.drop_duplicates(CHAVES_EGRESSO, keep='last')
+    substituidas = pd.MultiIndex.from_frame(atual[CHAVES_EGRESSO]).isin(pd.MultiIndex.from_frame(novos[CHAVES_EGRESSO]))
+    unidos = pd.concat([atual[~substituidas], novos], ignore_index=True)
+
+    # Colunas com categorias diferentes nos dois lados viram texto no concat; voltam a ser categorias
+    for coluna in dados.COLUNAS_CATEGORICAS:
+        if coluna in unidos.columns and unidos[coluna].dtype.name != 'category':
+            unidos[coluna] = unidos[coluna].astype('category')
+
+    return dados.ajustar_tipos(unidos), novos, bool(substituidas.any())
+
+
+def versao_ingestao(anterior, caminhos_novos):
+    """Versão dos dados depois da ingestão: a anterior mais o conteúdo dos CSVs acrescentados."""
+    impressoes = [dados.impressao_csv(caminho)['sha1'] for caminho in caminhos_novos]
+    return hashlib.sha1(repr((anterior, impressoes)).encode()).hexdigest()[:16]
+
+
+def ingerir(caminhos_novos, caminho_csv=dados.ARQUIVO_DADOS, caminho_snapshot=dados.ARQUIVO_SNAPSHOT,
+            caminho_indice=busca.ARQUIVO_INDICE, diretorio=compartilhado.DIRETORIO_COMPARTILHADO, processos=None):
+    """Acrescenta os CSVs de novos anos ao snapshot, atualiza o índice de busca e publica os artefatos da nova versão.
+
+    Só o índice de busca é incremental, e só quando nenhuma linha antiga muda de posição: o snapshot é
+    regravado inteiro e os artefatos da nova versão são reconstruídos a partir dele.
+    Retorna os dados unidos, as linhas novas e se o índice de busca foi só estendido.
+    """
+    anterior = dados.assinatura_dados(caminho_csv, caminho_snapshot)
+    atual = dados.carregar(None, caminho_csv, caminho_snapshot)
+    indice_aproveitavel = busca.indice_valido(caminho_indice, anterior)
+
+    novos = pd.concat([dados.ler_csv(caminho) for caminho in caminhos_novos], ignore_index=True)
+    unidos, novos, houve_substituicao = unir(atual, novos)
+
+    # O snapshot é mantido ordenado por partição; anos novos posteriores aos existentes vão para o final
+    ordenados = dados.ordenar_particoes(unidos)
+    n_antigas = len(unidos) - len(novos)
+    antigas_no_lugar = not houve_substituicao and bool((ordenados.index[:n_antigas] == np.arange(n_antigas)).all())
+    unidos = ordenados.reset_index(drop=True)
+
+    # Se nenhuma linha antiga mudou de posição, só as linhas novas são tokenizadas
+    indice_estendido = indice_aproveitavel and antigas_no_lugar
+    if indice_estendido:
+        indice = busca.estender_indice(busca.ler_indice(caminho_indice), unidos.iloc[n_antigas:])
+    else:
+        indice = busca.construir_indice(unidos)
+
+    # A partir daqui o snapshot é a fonte dos dados: os anos novos não estão no CSV, que não pode mais recriá-lo
+    origem = dados.ler_origem(caminho_snapshot) if os.path.exists(caminho_snapshot) else None
+    if origem is None:
+        origem = dados.impressao_csv(caminho_csv) if os.path.exists(caminho_csv) else {}
+    origem = dict(origem, versao=versao_ingestao(anterior, caminhos_novos), ingerido=True)
+
+    # O snapshot novo é gravado ao lado do atual, e os artefatos e o índice da nova versão são publicados a
+    # partir dele; só então ele substitui o atual. Os painéis abertos percebem a troca pela assinatura na
+    # próxima interação e já encontram tudo pronto, sem construir nada dentro de uma interação do usuário.
+    temporario = f'{caminho_snapshot}.{os.getpid()}.ingerindo'
+    try:
+        dados.salvar_snapshot(unidos, temporario, origem)
+        with ProcessPoolExecutor(processos) as executor:
+            compartilhado.publicar(origem['versao'], diretorio, executor, caminho_csv, temporario, limpar=False)
+        busca.salvar_indice(indice, caminho_indice, origem['versao'])
+        os.replace(temporario, caminho_snapshot)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+    # A versão anterior só é apagada depois da troca, enquanto os painéis que ainda a usam a mantêm mapeada
+    compartilhado.limpar_versoes(diretorio, compartilhado.nome_versao(origem['versao']))
+    return unidos, novos, indice_estendido
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Acrescenta novos anos de egressos da CAPES ao snapshot Parquet; '
+                                                 'só o índice de busca é estendido, o snapshot e os artefatos são reconstruídos.')
+    parser.add_argument('novos', nargs='+', help='CSVs com os anos a acrescentar, no mesmo layout do CSV de origem')
+    parser.add_argument('--csv', default=dados.ARQUIVO_DADOS, help='CSV de origem, usado se ainda não houver snapshot')
+    parser.add_argument('--snapshot', default=dados.ARQUIVO_SNAPSHOT, help='snapshot Parquet a atualizar')
+    parser.add_argument('--indice', default=busca.ARQUIVO_INDICE, help='índice de busca a atualizar')
+    parser.add_argument('--diretorio', default=compartilhado.DIRETORIO_COMPARTILHADO, help='diretório das versões')
+    parser.add_argument('--processos', type=int, default=None, help='processos em paralelo na publicação (padrão: um por CPU)')
+    args = parser.parse_args()
+
+    unidos, novos, indice_estendido = ingerir(args.novos, args.csv, args.snapshot, args.indice, args.diretorio, args.processos)
+    anos = ', '.join(str(ano) for ano in sorted(novos['AN_BASE'].unique()))
+    print(f'{len(novos)} linhas dos anos {anos} acrescentadas; o snapshot tem agora {len(unidos)} linhas')
+    if indice_estendido:
+        print('O índice de busca foi estendido só com as linhas novas; o snapshot e os artefatos foram reconstruídos')
+    else:
+        print('Linhas já existentes mudaram de posição e o snapshot, os artefatos e o índice de busca foram reconstruídos')
@@ -0,0 +1,229 @@
+import atexit
+import bisect
+import functools
+import hmac
+import itertools
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+# Diretório dos arquivos de métricas; DOCENCIA_METRICAS_DIRETORIO aponta para o diretório lido pelo node_exporter
+DIRETORIO_METRICAS = os.environ.get('DOCENCIA_METRICAS_DIRETORIO', tempfile.gettempdir())
+
+# Arquivo no formato texto do Prometheus, lido pelo coletor de arquivos do node_exporter; um por processo,
+# pois cada worker tem seus próprios histogramas e um sobrescreveria os do outro
+ARQUIVO_METRICAS = os.path.join(DIRETORIO_METRICAS, 'docencia_metricas.{processo}.prom')
+
+# Medição ligada por padrão; DOCENCIA_METRICAS=0 desliga
+ATIVO = os.environ.get('DOCENCIA_METRICAS', '1') != '0'
+
+# Token que libera o painel de desempenho (?admin=<token>); sem ele o painel nunca aparece
+TOKEN_ADMIN = os.environ.get('DOCENCIA_ADMIN', '')
+
+# Execuções guardadas para o painel de desempenho
+EXECUCOES_GUARDADAS = 20
+
+# Intervalo mínimo entre duas gravações do arquivo de métricas, em segundos
+INTERVALO_GRAVACAO = 10
+
+# Limites (em segundos) dos baldes dos histogramas
+LIMITES_HISTOGRAMA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Cada execução do script roda em uma thread; a medição em andamento fica nela
+_local = threading.local()
+
+# Histogramas por seção ({nome: [contagens por balde, soma]}), com None para a execução inteira
+_histogramas = {}
+_execucoes = deque(maxlen=EXECUCOES_GUARDADAS)
+_ultima_gravacao = 0.0
+_arquivos_gravados = set()
+_trava = threading.Lock()
+
+
+def iniciar_execucao():
+    """Começa a medir uma execução do script nesta thread, descartando uma medição interrompida."""
+    if ATIVO:
+        _local.execucao = {'inicio': time.perf_counter(), 'data': datetime.now(), 'pilha': [], 'quadros': [], 'secao': None}
+
+
+def _fechar_secao(execucao, agora):
+    """Registra a seção aberta, se houver, como um quadro de primeiro nível."""
+    if execucao['secao'] is not None:
+        nome, inicio = execucao['secao']
+        execucao['quadros'].append((nome, inicio - execucao['inicio'], agora - inicio))
+        execucao['secao'] = None
+        execucao['pilha'] = []
+
+
+def secao(nome):
+    """Fecha a seção anterior e abre outra; tudo até a próxima chamada é contado nela."""
+    execucao = getattr(_local, 'execucao', None)
+    if execucao is None:
+        return
+    agora = time.perf_counter()
+    _fechar_secao(execucao, agora)
+    execucao['secao'] = (nome, agora)
+    execucao['pilha'] = [nome]
+
+
+@contextmanager
+def medir(nome):
+    """Mede o bloco como um quadro aninhado na seção e nos blocos medidos em volta dele."""
+    execucao = getattr(_local, 'execucao', None)
+    if execucao is None:
+        yield
+        return
+
+    pilha = execucao['pilha']
+    pilha.append(nome)
+    caminho = ';'.join(pilha)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        execucao['quadros'].append((caminho, inicio - execucao['inicio'], time.perf_counter() - inicio))
+        pilha.pop()
+
+
+def medido(funcao):
+    """Decorador que mede cada chamada da função com o nome dela."""
+    @functools.wraps(funcao)
+    def medida(*args, **kwargs):
+        with medir(funcao.__name__):
+            return funcao(*args, **kwargs)
+    return medida
+
+
+def _observar(nome, duracao):
+    """Soma uma duração ao histograma do nome; chamado com a trava tomada."""
+    histograma = _histogramas.setdefault(nome, [[0] * (len(LIMITES_HISTOGRAMA) + 1), 0.0])
+    histograma[0][bisect.bisect_left(LIMITES_HISTOGRAMA, duracao)] += 1
+    histograma[1] += duracao
+
+
+def arquivo_processo(arquivo=ARQUIVO_METRICAS):
+    """Caminho do arquivo de métricas deste processo."""
+    return arquivo.format(processo=os.getpid())
+
+
+def _remover_arquivo(caminho):
+    """Apaga o arquivo de métricas ao sair, para o coletor não continuar lendo um processo encerrado."""
+    if os.path.exists(caminho):
+        os.remove(caminho)
+
+
+def finalizar_execucao(arquivo=ARQUIVO_METRICAS):
+    """Encerra a medição desta thread, acumula os histogramas e grava o arquivo de métricas se já passou o intervalo.
+
+    Execuções interrompidas por um novo clique não chegam aqui e são descartadas no próximo início.
+    O arquivo leva o pid no nome ({processo}) e as séries levam o rótulo processo, um por worker.
+    """
+    global _ultima_gravacao
+
+    execucao = getattr(_local, 'execucao', None)
+    if execucao is None:
+        return
+    _local.execucao = None
+
+    agora = time.perf_counter()
+    _fechar_secao(execucao, agora)
+    total = agora - execucao['inicio']
+
+    # Um quadro pode se repetir na execução (vários gráficos na mesma seção); o histograma recebe a soma
+    por_caminho = {}
+    for caminho, _, duracao in execucao['quadros']:
+        por_caminho[caminho] = por_caminho.get(caminho, 0.0) + duracao
+
+    with _trava:
+        _observar(None, total)
+        for caminho, duracao in por_caminho.items():
+            _observar(caminho, duracao)
+        _execucoes.append({'data': execucao['data'], 'total': total, 'quadros': execucao['quadros']})
+
+        gravar = time.monotonic() - _ultima_gravacao >= INTERVALO_GRAVACAO
+        if gravar:
+            _ultima_gravacao = time.monotonic()
+            texto = texto_prometheus()
+
+    if gravar:
+        arquivo = arquivo_processo(arquivo)
+        temporario = f'{arquivo}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(temporario, 'w', encoding='utf-8') as saida:
+                saida.write(texto)
+            os.replace(temporario, arquivo)
+        except OSError:
+            # Diretório ausente ou sem permissão de escrita: as métricas ficam só em memória, e a página segue
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            return
+        if arquivo not in _arquivos_gravados:
+            _arquivos_gravados.add(arquivo)
+            atexit.register(_remover_arquivo, arquivo)
+
+
+def _rotulo(valor):
+    """Escapa o valor de um rótulo no formato texto do Prometheus."""
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _linhas_histograma(metrica, rotulos, histograma):
+    """Linhas _bucket (acumuladas), _sum e _count de um histograma."""
+    contagens, soma = histograma
+    prefixo = rotulos + ',' if rotulos else ''
+    limites = [f'{limite:g}' for limite in LIMITES_HISTOGRAMA] + ['+Inf']
+    linhas = [f'{metrica}_bucket{{{prefixo}le="{limite}"}} {acumulado}'
+              for limite, acumulado in zip(limites, itertools.accumulate(contagens))]
+    sufixo = f'{{{rotulos}}}' if rotulos else ''
+    linhas.append(f'{metrica}_sum{sufixo} {soma:.6f}')
+    linhas.append(f'{metrica}_count{sufixo} {sum(contagens)}')
+    return linhas
+
+
+def texto_prometheus():
+    """Histogramas das execuções e de cada seção no formato texto do Prometheus, com o rótulo do processo."""
+    processo = f'processo="{os.getpid()}"'
+    linhas = [
+        '# HELP docencia_execucao_segundos Tempo de cada execução completa do script do painel.',
+        '# TYPE docencia_execucao_segundos histogram',
+    ]
+    if None in _histogramas:
+        linhas += _linhas_histograma('docencia_execucao_segundos', processo, _histogramas[None])
+
+    linhas += [
+        '# HELP docencia_secao_segundos Tempo por execução de cada seção e trecho medido, aninhados com ";".',
+        '# TYPE docencia_secao_segundos histogram',
+    ]
+    for nome in sorted(nome for nome in _histogramas if nome is not None):
+        linhas += _linhas_histograma('docencia_secao_segundos', f'{processo},secao="{_rotulo(nome)}"', _histogramas[nome])
+
+    return '\n'.join(linhas) + '\n'
+
+
+def ultimas_execucoes():
+    """As execuções guardadas deste processo, da mais recente para a mais antiga."""
+    with _trava:
+        return list(reversed(_execucoes))
+
+
+def resumo(execucoes):
+    """Tabela com o tempo, em segundos, de cada seção de primeiro nível em cada execução."""
+    linhas = []
+    for execucao in execucoes:
+        linha = {'Execução': execucao['data'].strftime('%H:%M:%S'), 'Total': execucao['total']}
+        for caminho, _, duracao in execucao['quadros']:
+            if ';' not in caminho:
+                linha[caminho] = linha.get(caminho, 0.0) + duracao
+        linhas.append(linha)
+    return pd.DataFrame(linhas).set_index('Execução').fillna(0).round(3) if linhas else pd.DataFrame()
+
+
+def administrador(token):
+    """Indica se o token recebido libera o painel de desempenho."""
+    return bool(TOKEN_ADMIN) and hmac.compare_digest(str(token), TOKEN_ADMIN)
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+# Colunas lidas para montar o índice de orientadores
+COLUNAS_ORIENTADORES = ('AN_BASE', 'NM_ENTIDADE_ENSINO', 'NM_ORIENTADOR', 'NM_ORIENTADOR_PRINCIPAL')
+
+# Quantidade padrão de orientadores nas listas de destaque
+QUANTIDADE_DESTAQUES = 10
+
+
+def construir_indice(df):
+    """Codifica orientadores e instituições como inteiros e monta, uma única vez, os contadores e as adjacências.
+
+    Cada egresso é atribuído ao orientador principal, ou ao orientador quando o principal não é informado.
+    """
+    principal = df['NM_ORIENTADOR_PRINCIPAL'].astype(object)
+    orientador = principal.where(principal.notna(), df['NM_ORIENTADOR'].astype(object))
+    codigos, nomes = pd.factorize(orientador)
+    entidades, nomes_entidades = pd.factorize(df['NM_ENTIDADE_ENSINO'])
+
+    # Linhas de cada orientador agrupadas em um único vetor, com o início de cada grupo
+    validas = np.flatnonzero(codigos >= 0)
+    linhas = validas[np.argsort(codigos[validas], kind='stable')]
+    egressos = np.bincount(codigos[validas], minlength=len(nomes))
+
+    indice = {
+        'nomes': np.asarray(nomes, dtype=object),
+        'codigo_nome': {nome: codigo for codigo, nome in enumerate(nomes)},
+        'nomes_entidades': np.asarray(nomes_entidades, dtype=object),
+        'codigos': codigos.astype('int32'),
+        'entidades': entidades.astype('int32'),
+        'anos': df['AN_BASE'].to_numpy(),
+        'egressos': egressos,
+        'inicios_linhas': np.concatenate([[0], np.cumsum(egressos)]),
+        'linhas': linhas,
+    }
+    indice['pares_instituicoes'] = pares_instituicoes(indice, validas)
+    return indice
+
+
+def pares_instituicoes(indice, posicoes):
+    """Adjacência orientador → instituição nas linhas indicadas, como pares únicos ordenados por orientador."""
+    codigos = indice['codigos'][posicoes].astype('int64')
+    entidades = indice['entidades'][posicoes]
+    n_entidades = len(indice['nomes_entidades'])
+
+    com_ambos = (codigos >= 0) & (entidades >= 0)
+    pares = np.unique(codigos[com_ambos] * n_entidades + entidades[com_ambos])
+    return pares // n_entidades, pares % n_entidades
+
+
+def _maiores(valores, k):
+    """Índices dos k maiores valores positivos, do maior para o menor, sem ordenar o vetor inteiro."""
+    k = min(k, np.count_nonzero(valores))
+    if k == 0:
+        return np.array([], dtype='int64')
+    candidatos = np.argpartition(-valores, k - 1)[:k]
+    return candidatos[np.lexsort((candidatos, -valores[candidatos]))]
+
+
+def _posicoes(indice, linhas_selecionadas):
+    """Posições das linhas selecionadas, ou None quando a seleção cobre todas as linhas."""
+    if linhas_selecionadas is None or linhas_selecionadas.all():
+        return None
+    return np.flatnonzero(linhas_selecionadas)
+
+
+def contagens(indice, linhas_selecionadas=None):
+    """Egressos por orientador; os contadores pré-calculados valem quando não há filtro."""
+    posicoes = _posicoes(indice, linhas_selecionadas)
+    if posicoes is None:
+        return indice['egressos']
+
+    codigos = indice['codigos'][posicoes]
+    return np.bincount(codigos[codigos >= 0], minlength=len(indice['nomes']))
+
+
+def mais_egressos(indice, k=QUANTIDADE_DESTAQUES, linhas_selecionadas=None):
+    """Os k orientadores com mais egressos nas linhas selecionadas."""
+    egressos = contagens(indice, linhas_selecionadas)
+    melhores = _maiores(egressos, k)
+    return pd.DataFrame({'Orientador': indice['nomes'][melhores], 'Egressos': egressos[melhores]})
+
+
+def varias_instituicoes(indice, k=QUANTIDADE_DESTAQUES, linhas_selecionadas=None):
+    """Os k orientadores presentes em mais instituições, entre os que aparecem em pelo menos duas."""
+    posicoes = _posicoes(indice, linhas_selecionadas)
+    if posicoes is None:
+        orientadores, entidades = indice['pares_instituicoes']
+    else:
+        orientadores, entidades = pares_instituicoes(indice, posicoes)
+
+    n_instituicoes = np.bincount(orientadores, minlength=len(indice['nomes']))
+    n_instituicoes[n_instituicoes < 2] = 0
+    melhores = _maiores(n_instituicoes, k)
+
+    # Os pares estão ordenados por orientador, então as instituições de cada um são um trecho contínuo
+    inicios = np.searchsorted(orientadores, melhores, side='left')
+    fins = np.searchsorted(orientadores, melhores, side='right')
+    nomes_instituicoes = [
+        ', '.join(sorted(indice['nomes_entidades'][entidades[inicio:fim]]))
+        for inicio, fim in zip(inicios, fins)
+    ]
+
+    return pd.DataFrame({
+        'Orientador': indice['nomes'][melhores],
+        'Quantidade de instituições': n_instituicoes[melhores],
+        'Instituições': nomes_instituicoes,
+    })
+
+
+def producao_anual(indice, orientador, linhas_selecionadas=None):
+    """Egressos do orientador por ano, consultando apenas as linhas dele."""
+    codigo = indice['codigo_nome'][orientador]
+    posicoes = indice['linhas'][indice['inicios_linhas'][codigo]:indice['inicios_linhas'][codigo + 1]]
+    if linhas_selecionadas is not None:
+        posicoes = posicoes[linhas_selecionadas[posicoes]]
+
+    anos = pd.Series(indice['anos'][posicoes], name='AN_BASE')
+    return anos.groupby(anos).size()
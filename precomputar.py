@@ -0,0 +1,58 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import busca
+import compartilhado
+import dados
+
+
+def gerar_indice_busca(caminho_csv, caminho_snapshot, caminho_indice, assinatura):
+    """Constrói e grava o índice de busca com a versão dos dados; roda em um processo separado."""
+    indice = busca.construir_indice(dados.carregar(busca.COLUNAS_BUSCA, caminho_csv, caminho_snapshot))
+    busca.salvar_indice(indice, caminho_indice, assinatura)
+    return len(indice['vocabulario'])
+
+
+def precomputar(caminho_csv=dados.ARQUIVO_DADOS, caminho_snapshot=dados.ARQUIVO_SNAPSHOT,
+                caminho_indice=busca.ARQUIVO_INDICE, diretorio=compartilhado.DIRETORIO_COMPARTILHADO,
+                processos=None):
+    """Gera o snapshot e, em paralelo, o índice de busca e os artefatos da versão usados pelo painel,
+    inclusive o índice de orientadores.
+
+    Retorna o diretório da versão publicada.
+    """
+    if not dados.snapshot_valido(caminho_csv, caminho_snapshot):
+        dados.gerar_snapshot(caminho_csv, caminho_snapshot)
+
+    # A assinatura é a mesma que o painel calcula ao abrir, então ele encontra a versão já publicada
+    assinatura = dados.assinatura_dados(caminho_csv, caminho_snapshot)
+
+    with ProcessPoolExecutor(processos) as executor:
+        indice_busca = None
+        if not busca.indice_valido(caminho_indice, assinatura):
+            indice_busca = executor.submit(gerar_indice_busca, caminho_csv, caminho_snapshot, caminho_indice, assinatura)
+
+        destino = compartilhado.publicar(assinatura, diretorio, executor, caminho_csv, caminho_snapshot)
+
+        if indice_busca is not None:
+            indice_busca.result()
+
+    return destino
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera antes da implantação todos os artefatos lidos pelo painel.')
+    parser.add_argument('--csv', default=dados.ARQUIVO_DADOS, help='CSV de origem')
+    parser.add_argument('--snapshot', default=dados.ARQUIVO_SNAPSHOT, help='snapshot Parquet')
+    parser.add_argument('--indice', default=busca.ARQUIVO_INDICE, help='índice de busca')
+    parser.add_argument('--diretorio', default=compartilhado.DIRETORIO_COMPARTILHADO, help='diretório das versões')
+    parser.add_argument('--processos', type=int, default=None, help='processos em paralelo (padrão: um por CPU)')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    destino = precomputar(args.csv, args.snapshot, args.indice, args.diretorio, args.processos)
+    print(f'Artefatos gravados em {destino} em {time.perf_counter() - inicio:.1f}s:')
+    for nome in sorted(os.listdir(destino)):
+        print(f'  {nome}')
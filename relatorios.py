@@ -0,0 +1,152 @@
+import argparse
+import functools
+import html
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from matplotlib.backends.backend_pdf import PdfPages
+
+import agregados
+import compartilhado
+import dados
+import filtros
+import graficos
+
+# Diretório padrão dos relatórios gerados
+DIRETORIO_RELATORIOS = 'relatorios'
+
+# Formatos dos relatórios: uma página HTML com as imagens ao lado ou um PDF com um gráfico por página
+FORMATOS = ('html', 'pdf')
+
+# Universidades entregues a cada processo de uma vez
+LOTE_UNIVERSIDADES = 8
+
+
+@functools.lru_cache(maxsize=1)
+def carregar_compartilhado(assinatura, diretorio=compartilhado.DIRETORIO_COMPARTILHADO):
+    """Artefatos publicados da versão, mapeados uma vez por processo e compartilhados pelo cache do sistema."""
+    artefatos = compartilhado.anexar(assinatura, diretorio)
+
+    # Linhas de estrangeiros, combinadas uma vez e usadas por todos os relatórios do processo
+    artefatos['linhas_estrangeiros'] = filtros.linhas_selecionadas(
+        artefatos['indice_filtros'], {'DS_TIPO_NACIONALIDADE_DISCENTE': ['ESTRANGEIRO']})
+    return artefatos
+
+
+def nome_arquivo(universidade):
+    """Nome de arquivo sem acentos nem espaços para a universidade."""
+    texto = unicodedata.normalize('NFKD', universidade).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^A-Za-z0-9]+', '_', texto).strip('_').lower() or 'universidade'
+
+
+def figuras(artefatos, universidade):
+    """Os gráficos do painel para a universidade, um de cada vez, com o nome de cada um."""
+    indice = artefatos['indice_universidades']['resumos'][universidade]
+
+    # Contagem anual e boxplots pré-calculados no índice de universidades, sem voltar às linhas brutas
+    contagens = indice['contagens_ano'].reset_index(name='counts')
+    yield 'contagem', graficos.linhas(contagens, 'Gráfico de linha de contagem de egressos por ano para ' + universidade)
+
+    yield 'idade', graficos.boxplot(
+        indice['boxplots_ano']['IDADE_APROX_DISCENTE'], True,
+        'Distribuição das idades aproximadas dos egressos de computação por ano para ' + universidade, 'Idade Aproximada')
+
+    yield 'titulacao', graficos.boxplot(
+        indice['boxplots_ano']['QT_MES_TITULACAO'], True,
+        'Distribuição do tempo até a titulação dos egressos de computação por ano para ' + universidade,
+        'Meses até titulação', limite_inferior=0)
+
+    # Estrangeiros da universidade, consultando apenas as linhas dela
+    posicoes = agregados.posicoes_universidade(artefatos['indice_universidades'], universidade, artefatos['linhas_estrangeiros'])
+    estrangeiros = agregados.contagens_ano(artefatos['dados'], posicoes).reset_index(name='counts')
+    yield 'estrangeiros', graficos.linhas(estrangeiros, 'Gráfico de linha de contagem de egressos estrangeiros por ano para ' + universidade)
+
+
+def relatorio_pdf(artefatos, universidade, caminho):
+    """Grava o relatório em PDF, uma página por gráfico, descartando cada figura logo depois de gravada."""
+    with PdfPages(caminho) as pdf:
+        for _, figura in figuras(artefatos, universidade):
+            pdf.savefig(figura, bbox_inches='tight')
+            figura.clear()
+
+
+def relatorio_html(artefatos, universidade, caminho):
+    """Grava o relatório em HTML, com cada gráfico em um PNG ao lado da página."""
+    base = os.path.splitext(caminho)[0]
+    imagens = []
+    for nome, figura in figuras(artefatos, universidade):
+        imagem = f'{base}_{nome}.png'
+        figura.savefig(imagem, format='png', bbox_inches='tight')
+        figura.clear()
+        imagens.append(os.path.basename(imagem))
+
+    titulo = html.escape(universidade)
+    corpo = '\n'.join(f'<p><img src="{imagem}" style="max-width: 100%;"></p>' for imagem in imagens)
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(f'<!DOCTYPE html>\n<html lang="pt-BR">\n<head><meta charset="utf-8"><title>{titulo}</title></head>\n'
+                      f'<body>\n<h1>Egressos de pós-graduação em computação: {titulo}</h1>\n{corpo}\n</body>\n</html>\n')
+
+
+# Função que grava o relatório em cada formato
+GERADORES = {'html': relatorio_html, 'pdf': relatorio_pdf}
+
+
+def gerar_relatorio(universidade, assinatura, destino, formato, diretorio=compartilhado.DIRETORIO_COMPARTILHADO):
+    """Gera o relatório de uma universidade; roda em um processo do pool e retorna o caminho gravado."""
+    caminho = os.path.join(destino, f'{nome_arquivo(universidade)}.{formato}')
+    GERADORES[formato](carregar_compartilhado(assinatura, diretorio), universidade, caminho)
+    return caminho
+
+
+def gravar_indice(relatorios, destino):
+    """Página com um link para o relatório de cada universidade."""
+    itens = '\n'.join(f'<li><a href="{os.path.basename(caminho)}">{html.escape(universidade)}</a></li>'
+                      for universidade, caminho in relatorios)
+    with open(os.path.join(destino, 'index.html'), 'w', encoding='utf-8') as arquivo:
+        arquivo.write(f'<!DOCTYPE html>\n<html lang="pt-BR">\n<head><meta charset="utf-8"><title>Relatórios por universidade</title></head>\n'
+                      f'<body>\n<h1>Relatórios por universidade</h1>\n<ul>\n{itens}\n</ul>\n</body>\n</html>\n')
+
+
+def gerar_relatorios(universidades=None, formato='html', destino=DIRETORIO_RELATORIOS,
+                     diretorio=compartilhado.DIRETORIO_COMPARTILHADO, processos=None):
+    """Gera em paralelo os relatórios das universidades pedidas, ou de todas, e retorna os pares (universidade, caminho).
+
+    O snapshot e os artefatos da versão são gerados uma única vez antes, aqui; cada processo só os mapeia em memória.
+    """
+    # assinatura_dados gera o snapshot aqui, se faltar; sem isso cada processo do pool o geraria ao mesmo tempo
+    assinatura = dados.assinatura_dados()
+    os.makedirs(destino, exist_ok=True)
+
+    with ProcessPoolExecutor(processos) as executor:
+        compartilhado.publicar(assinatura, diretorio, executor)
+
+        conhecidas = carregar_compartilhado(assinatura, diretorio)['indice_universidades']['nomes']
+        desconhecidas = sorted(set(universidades or ()) - set(conhecidas))
+        if desconhecidas:
+            raise ValueError('Universidades desconhecidas: ' + ', '.join(desconhecidas))
+        universidades = sorted(universidades or conhecidas)
+
+        caminhos = executor.map(gerar_relatorio, universidades, repeat(assinatura), repeat(destino), repeat(formato),
+                                repeat(diretorio), chunksize=LOTE_UNIVERSIDADES)
+        relatorios = list(zip(universidades, caminhos))
+
+    gravar_indice(relatorios, destino)
+    return relatorios
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera um relatório por universidade com os gráficos do painel.')
+    parser.add_argument('--universidades', nargs='+', default=None, help='universidades (padrão: todas)')
+    parser.add_argument('--formato', choices=FORMATOS, default='html', help='formato dos relatórios')
+    parser.add_argument('--saida', default=DIRETORIO_RELATORIOS, help='diretório dos relatórios')
+    parser.add_argument('--diretorio', default=compartilhado.DIRETORIO_COMPARTILHADO, help='diretório das versões')
+    parser.add_argument('--processos', type=int, default=None, help='processos em paralelo (padrão: um por CPU)')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    relatorios = gerar_relatorios(args.universidades, args.formato, args.saida, args.diretorio, args.processos)
+    print(f'{len(relatorios)} relatórios gravados em {args.saida} em {time.perf_counter() - inicio:.1f}s')
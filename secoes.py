@@ -0,0 +1,45 @@
+import streamlit as st
+
+import metricas
+
+# Prefixo do nome das funções de seção, retirado do nome registrado
+PREFIXO = 'secao_'
+
+# Primeira opção das caixas de seleção sob demanda; enquanto estiver escolhida, o detalhe não é calculado
+NENHUMA = 'Escolha uma opção'
+
+
+def secao(registro, pagina):
+    """Decorador que registra uma seção do painel na página indicada, na ordem em que é definida.
+
+    O registro é um dicionário criado a cada execução do script, para que sessões simultâneas não troquem suas seções.
+    """
+    def registrar(funcao):
+        nome = funcao.__name__[len(PREFIXO):] if funcao.__name__.startswith(PREFIXO) else funcao.__name__
+        registro[nome] = {'pagina': pagina, 'executar': funcao}
+        return funcao
+    return registrar
+
+
+def paginas(registro):
+    """Páginas com ao menos uma seção, na ordem da primeira seção de cada uma."""
+    return list(dict.fromkeys(s['pagina'] for s in registro.values()))
+
+
+def executar(registro, pagina):
+    """Executa só as seções da página, separadas por uma linha.
+
+    As seções das outras páginas não rodam; as da página são redesenhadas a cada execução, como todo elemento
+    do Streamlit, e reaproveitam os caches guardados pelos filtros da barra lateral.
+    """
+    for posicao, (nome, s) in enumerate((n, s) for n, s in registro.items() if s['pagina'] == pagina):
+        metricas.secao(nome)
+        if posicao:
+            st.markdown('---')
+        s['executar']()
+
+
+def escolha_sob_demanda(destino, rotulo, opcoes):
+    """Caixa de seleção que começa sem escolha; devolve None até que o usuário escolha uma opção."""
+    escolha = destino.selectbox(rotulo, [NENHUMA] + list(opcoes))
+    return None if escolha == NENHUMA else escolha